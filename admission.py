@@ -0,0 +1,211 @@
+import logging
+import math
+import threading
+import time
+from collections import Counter
+
+from flask import request, g, jsonify, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """Per-process token buckets, keyed by client."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def take(self, key, rate, burst):
+        """Take one token, return ``(allowed, retry_after_seconds)``."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - last) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            self._calls += 1
+            if self._calls % 1000 == 0:
+                self._prune(now, rate, burst)
+        return allowed, 0 if allowed else (1 - tokens) / rate
+
+    def _prune(self, now, rate, burst):
+        # a bucket idle long enough to be full again carries no state
+        idle = burst / rate
+        for key in [k for k, (_, last) in self._buckets.items() if now - last > idle]:
+            del self._buckets[key]
+
+
+class RedisBackend:
+    """Token buckets shared by every worker through Redis."""
+
+    SCRIPT = """
+    local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'last')
+    local tokens = tonumber(bucket[1]) or burst
+    local last = tonumber(bucket[2]) or now
+    tokens = math.min(burst, tokens + (now - last) * rate)
+    local allowed = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'last', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url):
+        import redis
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    def take(self, key, rate, burst):
+        allowed, tokens = self._script(keys=[f'fyyur:ratelimit:{key}'], args=[rate, burst, time.time()])
+        return bool(allowed), 0 if allowed else (1 - float(tokens)) / rate
+
+
+class AdmissionControl:
+    """Rate limiting, per-endpoint concurrency caps and load shedding.
+
+    Requests are checked in ``before_request``, cheapest test first:
+
+    * a per-client token bucket (``ADMISSION_RATE`` requests per second, bursts of
+      ``ADMISSION_BURST``), answering 429 when empty;
+    * the process-wide in-flight request count and the moving average of SQL
+      statement latency, answering 503 once ``ADMISSION_MAX_INFLIGHT`` or
+      ``ADMISSION_DB_LATENCY_LIMIT`` is exceeded;
+    * a concurrency cap for expensive endpoints (``ADMISSION_CONCURRENCY``),
+      answering 503 when every slot is busy.
+
+    Rejections carry ``Retry-After`` and every decision is counted; the counters
+    are served at ``/_admission``.  When the Redis backend is unreachable the
+    buckets fall back to this process's memory rather than failing requests.
+    """
+
+    exempt_endpoints = {'static', 'admission_stats'}
+
+    def __init__(self, app=None):
+        self.app = None
+        self.backend = None
+        self.fallback = MemoryBackend()
+        self._backend_failing = False
+        self.counters = Counter()
+        self.inflight = 0
+        self.db_latency = 0.0
+        self._slots = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['admission'] = self
+        if not app.config.get('ADMISSION_ENABLED', True):
+            return
+        redis_url = app.config.get('ADMISSION_REDIS_URL')
+        self.backend = RedisBackend(redis_url) if redis_url else MemoryBackend()
+        self._slots = {endpoint: threading.BoundedSemaphore(limit)
+                       for endpoint, limit in app.config.get('ADMISSION_CONCURRENCY', {}).items()}
+        event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+        app.before_request(self._admit)
+        app.teardown_request(self._release)
+        app.add_url_rule('/_admission', 'admission_stats', self.stats)
+
+    @staticmethod
+    def _sampled():
+        # only SQL of admitted requests: background loaders and CLI commands say
+        # nothing about how fast requests are being served
+        return has_request_context() and g.get('admission_admitted', False)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self._sampled():
+            conn.info.setdefault('admission_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if not self._sampled() or not conn.info.get('admission_start'):
+            return
+        elapsed = time.perf_counter() - conn.info['admission_start'].pop()
+        # exponentially weighted, roughly the last 20 statements
+        self.db_latency += (elapsed - self.db_latency) * 0.05
+
+    def _reject(self, status, reason, retry_after):
+        self.counters[reason] += 1
+        response = jsonify({'error': reason})
+        response.status_code = status
+        response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+        return response
+
+    def _admit(self):
+        if request.endpoint in self.exempt_endpoints:
+            return None
+        config = self.app.config
+
+        allowed, retry_after = self._take(self._client_key(), config['ADMISSION_RATE'], config['ADMISSION_BURST'])
+        if not allowed:
+            return self._reject(429, 'rate_limited', retry_after)
+
+        if self.db_latency > config['ADMISSION_DB_LATENCY_LIMIT']:
+            # decay so that a quiet period lets traffic back in
+            self.db_latency *= 0.9
+            return self._reject(503, 'shed_db_latency', config['ADMISSION_RETRY_AFTER'])
+        with self._lock:
+            full = self.inflight >= config['ADMISSION_MAX_INFLIGHT']
+            if not full:
+                self.inflight += 1
+        if full:
+            return self._reject(503, 'shed_queue_depth', config['ADMISSION_RETRY_AFTER'])
+        # from here on _release gives the in-flight slot back, also for rejections
+        g.admission_admitted = True
+
+        slots = self._slots.get(request.endpoint)
+        if slots is not None:
+            if not slots.acquire(blocking=False):
+                return self._reject(503, 'concurrency_limited', config['ADMISSION_RETRY_AFTER'])
+            g.admission_slots = slots
+
+        self.counters['admitted'] += 1
+        return None
+
+    def _client_key(self):
+        header = self.app.config.get('ADMISSION_CLIENT_HEADER')
+        value = request.headers.get(header) if header else None
+        if value:
+            return value.split(',')[0].strip()
+        return request.remote_addr or '-'
+
+    def _take(self, key, rate, burst):
+        try:
+            result = self.backend.take(key, rate, burst)
+        except Exception:
+            self.counters['backend_error'] += 1
+            if not self._backend_failing:
+                self._backend_failing = True
+                logger.warning('Rate limit backend failed, using per-process buckets', exc_info=True)
+            return self.fallback.take(key, rate, burst)
+        if self._backend_failing:
+            self._backend_failing = False
+            logger.warning('Rate limit backend recovered')
+        return result
+
+    def _release(self, exc=None):
+        slots = g.pop('admission_slots', None)
+        if slots is not None:
+            slots.release()
+        if g.pop('admission_admitted', False):
+            with self._lock:
+                self.inflight -= 1
+
+    def stats(self):
+        return jsonify({
+            'counters': dict(self.counters),
+            'inflight': self.inflight,
+            'db_latency_ms': round(self.db_latency * 1000, 3),
+            'backend': type(self.backend).__name__,
+        })
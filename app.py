@@ -1,6 +1,5 @@
-import logging
-import sys
-from logging import Formatter, FileHandler
+import click
+import time
 
 from flask import (
     Flask,
@@ -10,13 +9,27 @@ from flask import (
     redirect,
     url_for,
     abort,
+    jsonify,
 )
+from flask.cli import AppGroup
 from flask_migrate import Migrate
 from flask_moment import Moment
-from sqlalchemy import func
-from utils import format_datetime
+from utils import format_datetime, parse_range_bound
+from enums import StateChoices
 from forms import *
-from models import db, Venue, Artist, Show
+from models import db, Venue, Artist, Show, update_versioned, changed_values
+import queries
+from view_models import VenueDetail, ArtistDetail
+from search_index import Autocomplete
+from show_calendar import ShowCalendar
+from calendar_feeds import CalendarFeeds
+from admission import AdmissionControl
+from compression import Compress
+from fragment_cache import FragmentCache
+from profiling import RequestProfiler
+from rollups import Rollups
+from log_pipeline import LogPipeline
+import db_audit
 from flask_wtf.csrf import CSRFProtect
 
 # ----------------------------------------------------------------------------#
@@ -26,10 +39,21 @@ from flask_wtf.csrf import CSRFProtect
 app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object('config')
+if not app.debug:
+    # JSON logs written off the request threads, see log_pipeline.py
+    log_pipeline = LogPipeline(app)
 csrf = CSRFProtect(app)
+admission = AdmissionControl(app)
+compress = Compress(app)
 
 db.init_app(app)
 migrate = Migrate(app, db)
+autocomplete = Autocomplete(app)
+show_calendar = ShowCalendar(app)
+calendar_feeds = CalendarFeeds(app)
+fragment_cache = FragmentCache(app)
+profiler = RequestProfiler(app)
+rollups = Rollups(app)
 
 # ----------------------------------------------------------------------------#
 # Filters.
@@ -43,7 +67,17 @@ app.jinja_env.filters['datetime'] = format_datetime
 
 @app.route('/')
 def index():
-    return render_template('pages/home.html')
+    return render_template('pages/home.html', dashboard=rollups.dashboard())
+
+
+@app.route('/autocomplete', methods=['GET'])
+def autocomplete_lookup():
+    # served from the in-memory prefix index, never from the database
+    search_term = request.args.get('q', '')
+    kind = request.args.get('type')
+    if kind not in (None, 'venue', 'artist'):
+        abort(400)
+    return jsonify(autocomplete.lookup(search_term, kind=kind))
 
 
 #  Venues
@@ -52,9 +86,7 @@ def index():
 @app.route('/venues', methods=['GET'])
 def venues():
     # data = Venue.query.group_by('venue.city', 'venue.state').all()
-    data = Venue.query \
-        .with_entities(Venue.city, Venue.state, Venue.name, Venue.id, func.count(Venue.id)) \
-        .group_by(Venue.city, Venue.state, Venue.name, Venue.id).all()
+    data = queries.execute(queries.VENUE_AREAS).all()
     areas = list(set([(d.city, d.state) for d in data]))
     data = [
         {
@@ -63,7 +95,8 @@ def venues():
             'venues': [{
                 'id': d.id,
                 'name': d.name,
-                'num_upcoming_shows': d[4]
+                'version': d.version,
+                'num_upcoming_shows': d[5]
             } for d in data if d.city == area[0] and d.state == area[1]]
         } for area in areas
     ]
@@ -74,7 +107,7 @@ def venues():
 @app.route('/venues/search', methods=['POST'])
 def search_venues():
     search_term = request.form.get('search_term', '')
-    data = Venue.query.filter(Venue.name.ilike(f'%{search_term}%')).with_entities(Venue.id, Venue.name).all()
+    data = queries.execute(queries.SEARCH_VENUES, pattern=f'%{search_term}%').all()
     # select fields in db scope better than in python scope
     response = {
         "count": len(data),
@@ -84,34 +117,26 @@ def search_venues():
     return render_template('pages/search_venues.html', results=response, search_term=search_term)
 
 
+def _venue_detail(venue_id):
+    row = queries.execute(queries.VENUE_DETAIL, venue_id=venue_id).first()
+    if row is None:
+        abort(404)
+    return VenueDetail.from_rows(row, queries.execute(queries.VENUE_SHOWS, venue_id=venue_id))
+
+
 @app.route('/venues/<int:venue_id>')
 def show_venue(venue_id):
-    venue = Venue.query.get_or_404(venue_id)
+    return render_template('pages/show_venue.html', venue=_venue_detail(venue_id))
 
-    past_shows = []
-    upcoming_shows = []
-
-    for show in venue.shows:
-        temp_show = {
-            'artist_id': show.artist_id,
-            'artist_name': show.artist.name,
-            'artist_image_link': show.artist.image_link,
-            'start_time': show.start_time.strftime("%m/%d/%Y, %H:%M")
-        }
-        if show.start_time <= datetime.now():
-            past_shows.append(temp_show)
-        else:
-            upcoming_shows.append(temp_show)
 
-    # object class to dict
-    data = vars(venue)
+@app.route('/venues/<int:venue_id>.json')
+def show_venue_json(venue_id):
+    return jsonify(_venue_detail(venue_id).to_dict())
 
-    data['past_shows'] = past_shows
-    data['upcoming_shows'] = upcoming_shows
-    data['past_shows_count'] = len(past_shows)
-    data['upcoming_shows_count'] = len(upcoming_shows)
 
-    return render_template('pages/show_venue.html', venue=data)
+@app.route('/venues/<int:venue_id>/calendar.ics')
+def venue_calendar(venue_id):
+    return calendar_feeds.response('venue', venue_id)
 
 
 #  Create Venue
@@ -138,10 +163,12 @@ def create_venue_submission():
         db.session.commit()
         flash(f'Venue {obj.name}  was successfully listed!')
         obj_id = obj.id
+        autocomplete.upsert('venue', obj_id, form_data['name'], form_data['city'], form_data['genres'])
+        show_calendar.set_venue_place(obj_id, form_data['city'], form_data['state'])
 
     except:
         db.session.rollback()
-        print(sys.exc_info())
+        app.logger.exception('Venue could not be listed.')
         # on successful db insert, flash success
         flash('An error occurred. Venue could not be listed.', 'error')
 
@@ -155,13 +182,18 @@ def create_venue_submission():
 def delete_venue(venue_id):
     venue = Venue.query.get_or_404(venue_id)
     name = str(venue.name)
+    obj_id = venue.id
     try:
+        rollups.remove_shows(Show.venue_id == obj_id)
         db.session.delete(venue)
         db.session.commit()
+        autocomplete.remove('venue', obj_id)
+        show_calendar.remove_venue(obj_id)
+        calendar_feeds.invalidate('venue', obj_id)
         flash(f'Venue {name} was successfully deleted!')
     except:
         db.session.rollback()
-        print(sys.exc_info())
+        app.logger.exception(f'Venue {name} could not be deleted.')
         flash(f'An error occurred. Venue {name} could not be deleted.', 'error')
     finally:
         db.session.close()
@@ -173,14 +205,14 @@ def delete_venue(venue_id):
 #  ----------------------------------------------------------------
 @app.route('/artists')
 def artists():
-    data = Artist.query.with_entities(Artist.id, Artist.name).all()
+    data = queries.execute(queries.ARTIST_LIST).all()
     return render_template('pages/artists.html', artists=data)
 
 
 @app.route('/artists/search', methods=['POST'])
 def search_artists():
     search_term = request.form.get('search_term', '')
-    data = Artist.query.filter(Artist.name.ilike(f'%{search_term}%')).all()
+    data = queries.execute(queries.SEARCH_ARTISTS, pattern=f'%{search_term}%').all()
 
     response = {
         "count": len(data),
@@ -191,34 +223,26 @@ def search_artists():
                            search_term=search_term)
 
 
+def _artist_detail(artist_id):
+    row = queries.execute(queries.ARTIST_DETAIL, artist_id=artist_id).first()
+    if row is None:
+        abort(404)
+    return ArtistDetail.from_rows(row, queries.execute(queries.ARTIST_SHOWS, artist_id=artist_id))
+
+
 @app.route('/artists/<int:artist_id>')
 def show_artist(artist_id):
-    artist = Artist.query.get_or_404(artist_id)
+    return render_template('pages/show_artist.html', artist=_artist_detail(artist_id))
 
-    past_shows = []
-    upcoming_shows = []
-
-    for show in artist.shows:
-        temp_show = {
-            'venue_id': show.venue_id,
-            'venue_name': show.venue.name,
-            'venue_image_link': show.venue.image_link,
-            'start_time': show.start_time.strftime("%m/%d/%Y, %H:%M")
-        }
-        if show.start_time <= datetime.now():
-            past_shows.append(temp_show)
-        else:
-            upcoming_shows.append(temp_show)
 
-    # object class to dict
-    data = vars(artist)
+@app.route('/artists/<int:artist_id>.json')
+def show_artist_json(artist_id):
+    return jsonify(_artist_detail(artist_id).to_dict())
 
-    data['past_shows'] = past_shows
-    data['upcoming_shows'] = upcoming_shows
-    data['past_shows_count'] = len(past_shows)
-    data['upcoming_shows_count'] = len(upcoming_shows)
 
-    return render_template('pages/show_artist.html', artist=artist)
+@app.route('/artists/<int:artist_id>/calendar.ics')
+def artist_calendar(artist_id):
+    return calendar_feeds.response('artist', artist_id)
 
 
 #  Update
@@ -226,56 +250,101 @@ def show_artist(artist_id):
 @app.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
     artist = Artist.query.get_or_404(artist_id)
-    form = ArtistForm(obj=artist)
+    form = EditArtistForm(obj=artist)
 
     return render_template('forms/edit_artist.html', form=form, artist=artist)
 
 
 @app.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
-    artist = Artist.query.get_or_404(artist_id)
-    form = ArtistForm(formdata=request.form, obj=artist)
+    form = EditArtistForm(formdata=request.form)
     if not form.validate_on_submit():
+        artist = Artist.query.with_entities(Artist.id, Artist.name).filter(Artist.id == artist_id).first_or_404()
         flash(form.errors, category='error')
         return render_template('forms/edit_artist.html', form=form, artist=artist)
+    form_data = form.data.copy()
+    form_data.pop('csrf_token', None)
+    version = form_data.pop('version')
     try:
-        form.populate_obj(artist)
-        db.session.add(artist)
-        db.session.commit()
-        flash(f'Artist {artist.name} was successfully updated!')
+        before = queries.execute(queries.ARTIST_AT_VERSION, artist_id=artist_id, version=version).first()
+        # one UPDATE ... RETURNING of the changed columns, guarded by the version the form was rendered from
+        row, current_version = update_versioned(Artist, artist_id, version, changed_values(before, form_data))
+        if row is None:
+            db.session.rollback()
+        else:
+            rollups.regenre_artist(artist_id, before.genres, form_data['genres'])
+            db.session.commit()
     except:
         db.session.rollback()
-        print(sys.exc_info())
-        flash(f'An error occurred. Artist {artist.name} could not be updated.', 'error')
+        app.logger.exception(f'Artist {form.name.data} could not be updated.')
+        flash(f'An error occurred. Artist {form.name.data} could not be updated.', 'error')
+        return redirect(url_for('show_artist', artist_id=artist_id))
     finally:
         db.session.close()
+
+    if row is None:
+        if current_version is None:
+            abort(404)
+        flash(f'Artist {form.name.data} was changed by someone else while you were editing. '
+              f'Review your changes and submit again to overwrite them.', 'error')
+        form.version.raw_data = None
+        form.version.data = current_version
+        return render_template('forms/edit_artist.html', form=form,
+                               artist={'id': artist_id, 'name': form.name.data}), 409
+
+    autocomplete.upsert('artist', artist_id, row.name, form.city.data, form.genres.data)
+    calendar_feeds.invalidate('artist', artist_id)
+    flash(f'Artist {row.name} was successfully updated!')
     return redirect(url_for('show_artist', artist_id=artist_id))
 
 
 @app.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
     venue = Venue.query.get_or_404(venue_id)
-    form = VenueForm(obj=venue)
+    form = EditVenueForm(obj=venue)
     return render_template('forms/edit_venue.html', form=form, venue=venue)
 
 
 @app.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
-    venue = Venue.query.get_or_404(venue_id)
-    form = VenueForm(formdata=request.form)
+    form = EditVenueForm(formdata=request.form)
     if not form.validate_on_submit():
+        venue = Venue.query.with_entities(Venue.id, Venue.name).filter(Venue.id == venue_id).first_or_404()
         flash(form.errors, category='error')
         return render_template('forms/edit_venue.html', form=form, venue=venue)
+    form_data = form.data.copy()
+    form_data.pop('csrf_token', None)
+    version = form_data.pop('version')
     try:
-        form.populate_obj(venue)
-        db.session.commit()
-        flash(f'Venue {venue.name} was successfully updated!')
+        before = queries.execute(queries.VENUE_AT_VERSION, venue_id=venue_id, version=version).first()
+        row, current_version = update_versioned(Venue, venue_id, version, changed_values(before, form_data))
+        if row is None:
+            db.session.rollback()
+        else:
+            rollups.move_venue(venue_id, (before.city, before.state), (form_data['city'], form_data['state']))
+            db.session.commit()
     except:
         db.session.rollback()
-        print(sys.exc_info())
-        flash(f'An error occurred. Venue {venue.name} could not be updated.', 'error')
+        app.logger.exception(f'Venue {form.name.data} could not be updated.')
+        flash(f'An error occurred. Venue {form.name.data} could not be updated.', 'error')
+        return redirect(url_for('show_venue', venue_id=venue_id))
     finally:
         db.session.close()
+
+    if row is None:
+        if current_version is None:
+            abort(404)
+        flash(f'Venue {form.name.data} was changed by someone else while you were editing. '
+              f'Review your changes and submit again to overwrite them.', 'error')
+        form.version.raw_data = None
+        form.version.data = current_version
+        return render_template('forms/edit_venue.html', form=form,
+                               venue={'id': venue_id, 'name': form.name.data}), 409
+
+    autocomplete.upsert('venue', venue_id, row.name, form.city.data, form.genres.data)
+    show_calendar.set_venue_place(venue_id, form.city.data, form.state.data)
+    calendar_feeds.invalidate('venue', venue_id)
+    flash(f'Venue {row.name} was successfully updated!')
     return redirect(url_for('show_venue', venue_id=venue_id))
 
 
@@ -304,9 +373,10 @@ def create_artist_submission():
         db.session.commit()
         flash(f'Artist {name} was successfully listed!')
         obj_id = artist.id
+        autocomplete.upsert('artist', obj_id, form_data['name'], form_data['city'], form_data['genres'])
     except:
         db.session.rollback()
-        print(sys.exc_info())
+        app.logger.exception(f'Artist {name} could not be listed.')
         flash(f'An error occurred. Artist {name} could not be listed.', 'error')
     finally:
         db.session.close()
@@ -319,11 +389,44 @@ def create_artist_submission():
 
 @app.route('/shows')
 def shows():
-    data = Show.query.join(Artist).join(Venue).with_entities(
-        Show.venue_id, Venue.name.label('venue_name'), Show.artist_id, Artist.name.label('artist_name'),
-        Artist.image_link.label('artist_image_link'), Show.start_time).all()
-
-    return render_template('pages/shows.html', shows=data)
+    try:
+        start = parse_range_bound(request.args.get('from'))
+        end = parse_range_bound(request.args.get('to'), end=True)
+    except (ValueError, OverflowError):
+        abort(400)
+    city = request.args.get('city') or None
+    state = request.args.get('state') or None
+
+    if show_calendar.ready:
+        rows = show_calendar.between(start, end, city, state)
+        venue_ids = {row[2] for row in rows}
+        artist_ids = {row[3] for row in rows}
+        venues_by_id = {v.id: v for v in queries.execute(queries.VENUES_BY_IDS, ids=list(venue_ids))}
+        artists_by_id = {a.id: a for a in queries.execute(queries.ARTISTS_BY_IDS, ids=list(artist_ids))}
+        data = []
+        for show_id, start_time, venue_id, artist_id in rows:
+            venue = venues_by_id.get(venue_id)
+            artist = artists_by_id.get(artist_id)
+            if venue is None or artist is None:
+                continue
+            data.append({
+                'id': show_id,
+                'venue_id': venue_id,
+                'venue_name': venue.name,
+                'venue_version': venue.version,
+                'artist_id': artist_id,
+                'artist_name': artist.name,
+                'artist_image_link': artist.image_link,
+                'artist_version': artist.version,
+                'start_time': start_time,
+            })
+    else:
+        # cold start: the calendar is still loading, use the Show.start_time index
+        data = queries.shows_between(start, end, city, state)
+
+    return render_template('pages/shows.html', shows=data, states=StateChoices.choices(),
+                           filters={'from': request.args.get('from', ''), 'to': request.args.get('to', ''),
+                                    'city': city or '', 'state': state or ''})
 
 
 @app.route('/shows/create', methods=['GET'])
@@ -345,12 +448,17 @@ def create_show_submission():
     try:
         show = Show(**form_data)
         db.session.add(show)
+        db.session.flush()
+        rollups.add_shows(Show.id == show.id)
         db.session.commit()
         flash(f'Show was successfully listed!')
         obj_id = show.id
+        show_calendar.add_show(obj_id, form_data['start_time'], int(form_data['venue_id']), int(form_data['artist_id']))
+        calendar_feeds.invalidate('venue', form_data['venue_id'])
+        calendar_feeds.invalidate('artist', form_data['artist_id'])
     except:
         db.session.rollback()
-        print(sys.exc_info())
+        app.logger.exception('Show could not be listed.')
         flash(f'An error occurred. Show could not be listed.', 'error')
     finally:
         db.session.close()
@@ -367,13 +475,55 @@ def server_error(error):
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'))
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+# ----------------------------------------------------------------------------#
+# Commands.
+# ----------------------------------------------------------------------------#
+
+fyyur_cli = AppGroup('fyyur', help='Fyyur maintenance commands.')
+
+
+@fyyur_cli.command('profile-token')
+def profile_token():
+    """Print a token that enables profiling for requests carrying it."""
+    if not app.config.get('PROFILE_SECRET'):
+        raise click.ClickException('Set PROFILE_SECRET, shared by the server and this command, to sign profile tokens.')
+    click.echo(profiler.make_token())
+
+
+@fyyur_cli.command('db-audit')
+@click.option('--analyze', is_flag=True, help='Run EXPLAIN ANALYZE, which executes the queries.')
+@click.option('--write-migration/--no-write-migration', default=True,
+              help='Write an Alembic migration creating the missing indexes.')
+def db_audit_command(analyze, write_migration):
+    """EXPLAIN every query the routes issue and report sequential scans and missing indexes."""
+    statements = db_audit.capture_statements(app)
+    with db.engine.connect() as connection:
+        for statement, parameters in statements.items():
+            scans, plan = db_audit.sequential_scans(connection, statement, parameters, analyze)
+            if scans:
+                click.secho(f'Sequential scan on {", ".join(sorted(set(scans)))}:', fg='yellow')
+                click.echo(f'  {" ".join(statement.split())}')
+        missing = db_audit.missing_indexes(connection)
+    click.echo(f'{len(statements)} distinct statements audited.')
+    if not missing:
+        click.secho('No missing indexes.', fg='green')
+        return
+    for table, columns in missing:
+        click.secho(f'Missing index on {table}({", ".join(columns)})', fg='red')
+    if write_migration:
+        path = db_audit.write_migration(migrate.directory, missing)
+        click.echo(f'Wrote {path}, apply it with `flask db upgrade`.')
+
+
+@fyyur_cli.command('rollup-backfill')
+def rollup_backfill():
+    """Rebuild the dashboard rollups from the Show, Venue and Artist tables."""
+    started = time.perf_counter()
+    shows = rollups.backfill()
+    click.echo(f'Rolled up {shows} shows in {time.perf_counter() - started:.2f}s.')
+
+
+app.cli.add_command(fyyur_cli)
 
 # ----------------------------------------------------------------------------#
 # Launch.
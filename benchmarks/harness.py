@@ -0,0 +1,78 @@
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+CITIES = [('San Francisco', 'CA'), ('New York', 'NY'), ('Austin', 'TX'), ('Seattle', 'WA'), ('Chicago', 'IL')]
+GENRES = ['Jazz', 'Blues', 'Folk', 'Punk', 'Soul', 'Reggae', 'Classical', 'HipHop']
+
+
+def create_app(database_url='sqlite://'):
+    """Import the Fyyur app against ``database_url`` with background jobs and request guards off."""
+    os.environ['DATABASE_URL'] = database_url
+    import config
+    config.SQLALCHEMY_DATABASE_URI = database_url
+    config.WTF_CSRF_ENABLED = False
+    config.ADMISSION_ENABLED = False
+    config.AUTOCOMPLETE_PRELOAD = False
+    config.SHOW_CALENDAR_PRELOAD = False
+    config.PROFILE_SAMPLE_RATE = 0
+    import app as fyyur
+    return fyyur
+
+
+def seed(fyyur, venues=200, artists=500, shows=5000, seed_value=46):
+    """Fill an empty database with reproducible data and load the in-memory indexes."""
+    from models import db, Venue, Artist, Show
+
+    rng = random.Random(seed_value)
+    now = datetime.now().replace(microsecond=0)
+    with fyyur.app.app_context():
+        db.create_all()
+        db.session.add_all(Venue(
+            name=f'Venue {i}', city=city, state=state, address=f'{i} Main St', phone='123-456-7890',
+            image_link=f'https://example.com/venue/{i}.jpg', genres=rng.sample(GENRES, 2),
+            seeking_talent=bool(i % 2), seeking_description='Looking for bands')
+            for i, (city, state) in ((i, rng.choice(CITIES)) for i in range(venues)))
+        db.session.add_all(Artist(
+            name=f'Artist {i}', city=city, state=state, phone='123-456-7890',
+            image_link=f'https://example.com/artist/{i}.jpg', genres=rng.sample(GENRES, 2),
+            seeking_venue=bool(i % 2), seeking_description='Looking for venues')
+            for i, (city, state) in ((i, rng.choice(CITIES)) for i in range(artists)))
+        db.session.flush()
+        db.session.add_all(Show(
+            venue_id=rng.randint(1, venues), artist_id=rng.randint(1, artists),
+            start_time=now + timedelta(hours=rng.randint(-24 * 365, 24 * 365)))
+            for _ in range(shows))
+        db.session.commit()
+        fyyur.autocomplete.load()
+        fyyur.show_calendar.load()
+        fyyur.rollups.backfill()
+
+
+def measure(fn, repeat):
+    """Call ``fn`` ``repeat`` times; return wall and CPU milliseconds per call."""
+    wall = []
+    cpu_start = time.process_time()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        wall.append((time.perf_counter() - start) * 1000)
+    cpu = (time.process_time() - cpu_start) * 1000 / repeat
+    wall.sort()
+    return {
+        'mean_ms': statistics.fmean(wall),
+        'p50_ms': wall[len(wall) // 2],
+        'p95_ms': wall[min(len(wall) - 1, int(len(wall) * 0.95))],
+        'cpu_ms': cpu,
+    }
+
+
+def print_table(rows, columns):
+    widths = [max(len(str(c)), *(len(f'{r[c]:.3f}' if isinstance(r[c], float) else str(r[c])) for r in rows))
+              for c in columns]
+    print('  '.join(str(c).ljust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print('  '.join((f'{row[c]:.3f}' if isinstance(row[c], float) else str(row[c])).ljust(w)
+                        for c, w in zip(columns, widths)))
@@ -0,0 +1,68 @@
+"""Per-route latency benchmark and CI performance gate.
+
+    python -m benchmarks.routes
+    python -m benchmarks.routes --database sqlite:////tmp/fyyur-bench.db --max-ms shows=25 --max-ms show_venue=10
+
+Runs the app in-process on SQLite, seeds it and times each route through the
+Flask test client.  Exits non-zero when a route's mean time exceeds its
+``--max-ms`` budget.
+"""
+import argparse
+import sys
+
+from benchmarks.harness import create_app, seed, measure, print_table
+
+ROUTES = [
+    ('index', 'GET', '/', None),
+    ('venues', 'GET', '/venues', None),
+    ('artists', 'GET', '/artists', None),
+    ('shows', 'GET', '/shows', None),
+    ('shows_range', 'GET', '/shows?from=2026-01-01&to=2026-03-01&state=CA', None),
+    ('show_venue', 'GET', '/venues/1', None),
+    ('show_artist', 'GET', '/artists/1', None),
+    ('venue_calendar', 'GET', '/venues/1/calendar.ics', None),
+    ('search_venues', 'POST', '/venues/search', {'search_term': 'venue 1'}),
+    ('search_artists', 'POST', '/artists/search', {'search_term': 'artist 1'}),
+    ('autocomplete', 'GET', '/autocomplete?q=art', None),
+]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', default='sqlite://', help='SQLAlchemy URL, in-memory SQLite by default')
+    parser.add_argument('--venues', type=int, default=200)
+    parser.add_argument('--artists', type=int, default=500)
+    parser.add_argument('--shows', type=int, default=5000)
+    parser.add_argument('--requests', type=int, default=50, help='timed requests per route')
+    parser.add_argument('--max-ms', action='append', default=[], metavar='ROUTE=MS',
+                        help='fail when the mean time of ROUTE exceeds MS milliseconds')
+    args = parser.parse_args(argv)
+    budgets = {name: float(ms) for name, ms in (item.split('=', 1) for item in args.max_ms)}
+
+    fyyur = create_app(args.database)
+    seed(fyyur, args.venues, args.artists, args.shows)
+    client = fyyur.app.test_client()
+
+    rows = []
+    failed = []
+    for name, method, path, data in ROUTES:
+        def request():
+            response = client.open(path, method=method, data=data)
+            assert response.status_code < 400, (path, response.status_code)
+
+        request()  # warm up caches and compiled statements
+        result = measure(request, args.requests)
+        budget = budgets.get(name)
+        if budget is not None and result['mean_ms'] > budget:
+            failed.append(name)
+        rows.append({'route': name, **result, 'budget_ms': budget if budget is not None else '-'})
+
+    print_table(rows, ['route', 'mean_ms', 'p50_ms', 'p95_ms', 'cpu_ms', 'budget_ms'])
+    if failed:
+        print(f'Over budget: {", ".join(failed)}', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""CPU cost of the hot-route queries: per-request ``Query`` building versus queries.py.
+
+    python -m benchmarks.statements
+    python -m benchmarks.statements --calls 2000
+
+Each pair runs the same SQL against a seeded in-memory SQLite database, once
+built as a legacy ``Model.query`` chain on every call and once from the
+pre-built statements in ``queries``, and reports the CPU microseconds per
+call each way.
+"""
+import argparse
+import sys
+import time
+
+from benchmarks.harness import create_app, seed, print_table
+
+
+def cpu_us(fn, calls):
+    start = time.process_time()
+    for _ in range(calls):
+        fn()
+    return (time.process_time() - start) * 1e6 / calls
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', default='sqlite://', help='SQLAlchemy URL, in-memory SQLite by default')
+    parser.add_argument('--calls', type=int, default=1000, help='timed calls per query')
+    args = parser.parse_args(argv)
+
+    fyyur = create_app(args.database)
+    seed(fyyur, venues=50, artists=100, shows=500)
+
+    import queries
+    from sqlalchemy import func
+    from models import Venue, Artist, Show
+
+    pairs = [
+        ('venues',
+         lambda: Venue.query.with_entities(Venue.city, Venue.state, Venue.name, Venue.id, Venue.version,
+                                           func.count(Venue.id))
+         .group_by(Venue.city, Venue.state, Venue.name, Venue.id, Venue.version).all(),
+         lambda: queries.execute(queries.VENUE_AREAS).all()),
+        ('search_venues',
+         lambda: Venue.query.filter(Venue.name.ilike('%venue 1%')).with_entities(Venue.id, Venue.name).all(),
+         lambda: queries.execute(queries.SEARCH_VENUES, pattern='%venue 1%').all()),
+        ('venue_shows',
+         lambda: Show.query.join(Artist).filter(Show.venue_id == 1)
+         .with_entities(Show.id, Show.start_time, Show.artist_id, Artist.name, Artist.image_link,
+                        Artist.version).order_by(Show.start_time).all(),
+         lambda: queries.execute(queries.VENUE_SHOWS, venue_id=1).all()),
+        ('shows',
+         lambda: Show.query.join(Artist).join(Venue).filter(Venue.state == 'CA')
+         .with_entities(Show.id, Show.venue_id, Venue.name, Venue.version, Show.artist_id, Artist.name,
+                        Artist.image_link, Artist.version, Show.start_time).order_by(Show.start_time).all(),
+         lambda: queries.shows_between(state='CA')),
+    ]
+
+    rows = []
+    with fyyur.app.app_context():
+        for name, legacy, prepared in pairs:
+            legacy()
+            prepared()
+            legacy_us = cpu_us(legacy, args.calls)
+            prepared_us = cpu_us(prepared, args.calls)
+            rows.append({'query': name, 'query_us': legacy_us, 'prepared_us': prepared_us,
+                         'saved_us': legacy_us - prepared_us})
+
+    print_table(rows, ['query', 'query_us', 'prepared_us', 'saved_us'])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""Memory per detail-page request: ``vars(model)`` pages versus the view models.
+
+    python -m benchmarks.view_models
+    python -m benchmarks.view_models --shows 20000 --requests 50
+
+For the venue and artist pages, builds the template data the old way (ORM
+instance, ``vars()`` and a dict per show) and from ``view_models``, renders
+it, and reports from tracemalloc the peak traced memory per request and the
+memory blocks still held by the page data at render time.
+"""
+import argparse
+import gc
+import sys
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.harness import create_app, seed, print_table
+
+
+def legacy_detail(model, obj_id, other):
+    obj = model.query.get_or_404(obj_id)
+    past_shows = []
+    upcoming_shows = []
+    for show in obj.shows:
+        linked = getattr(show, other)
+        temp_show = {
+            f'{other}_id': linked.id,
+            f'{other}_name': linked.name,
+            f'{other}_image_link': linked.image_link,
+            f'{other}_version': linked.version,
+            'id': show.id,
+            'start_time': show.start_time,
+        }
+        if show.start_time <= datetime.now():
+            past_shows.append(temp_show)
+        else:
+            upcoming_shows.append(temp_show)
+    data = vars(obj)
+    data['past_shows'] = past_shows
+    data['upcoming_shows'] = upcoming_shows
+    data['past_shows_count'] = len(past_shows)
+    data['upcoming_shows_count'] = len(upcoming_shows)
+    return data
+
+
+def measure_memory(build, render, repeat):
+    """Mean peak KiB per build+render, and KiB / blocks held by the built data."""
+    peaks = []
+    held_kib = held_blocks = 0
+    for _ in range(repeat):
+        gc.collect()
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        start, _ = tracemalloc.get_traced_memory()
+        data = build()
+        after = tracemalloc.take_snapshot()
+        render(data)
+        peaks.append((tracemalloc.get_traced_memory()[1] - start) / 1024)
+        diff = after.compare_to(before, 'filename')
+        held_kib = sum(stat.size_diff for stat in diff) / 1024
+        held_blocks = sum(stat.count_diff for stat in diff)
+        del data
+    return {'peak_kib': sum(peaks) / len(peaks), 'held_kib': held_kib, 'held_blocks': held_blocks}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', default='sqlite://', help='SQLAlchemy URL, in-memory SQLite by default')
+    parser.add_argument('--venues', type=int, default=20)
+    parser.add_argument('--artists', type=int, default=50)
+    parser.add_argument('--shows', type=int, default=5000)
+    parser.add_argument('--requests', type=int, default=20, help='measured requests per page')
+    args = parser.parse_args(argv)
+
+    fyyur = create_app(args.database)
+    seed(fyyur, args.venues, args.artists, args.shows)
+
+    from flask import render_template
+    from models import db, Venue, Artist
+
+    pages = [
+        ('show_venue', 'venue', lambda: legacy_detail(Venue, 1, 'artist'), lambda: fyyur._venue_detail(1)),
+        ('show_artist', 'artist', lambda: legacy_detail(Artist, 1, 'venue'), lambda: fyyur._artist_detail(1)),
+    ]
+
+    rows = []
+    tracemalloc.start()
+    for name, kind, legacy, view_model in pages:
+        def render(data):
+            render_template(f'pages/{name}.html', **{kind: data})
+
+        for label, build in (('vars(model)', legacy), ('view model', view_model)):
+            with fyyur.app.test_request_context():
+                def fresh_build():
+                    # a new session per request, as in the app
+                    db.session.remove()
+                    return build()
+
+                render(fresh_build())
+                rows.append({'page': name, 'data': label, **measure_memory(fresh_build, render, args.requests)})
+    tracemalloc.stop()
+
+    print_table(rows, ['page', 'data', 'peak_kib', 'held_kib', 'held_blocks'])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,161 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import timezone
+
+from flask import request, Response, abort, url_for
+
+from models import Venue, Artist, Show
+
+SHOW_DURATION = 'PT2H'
+
+
+def _escape(value):
+    return (value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def _fold(line):
+    # RFC 5545 3.1: lines longer than 75 octets are folded with CRLF + space
+    data = line.encode('utf-8')
+    if len(data) <= 75:
+        return line
+    parts = []
+    while len(data) > 75:
+        cut = 75 if not parts else 74
+        while cut and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(data[:cut].decode('utf-8'))
+        data = data[cut:]
+    parts.append(data.decode('utf-8'))
+    return '\r\n '.join(parts)
+
+
+def _utc(value):
+    return value.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+class CachedFeed:
+    __slots__ = ('body', 'etag', 'depends', 'expires')
+
+    def __init__(self, body, depends):
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.depends = depends
+        self.expires = None
+
+
+class CalendarFeeds:
+    """Pre-rendered iCalendar feeds per venue and artist.
+
+    A feed is rendered on first request and served from memory until a show is
+    created for its entity or an entity it mentions is edited, so polling
+    calendar clients mostly get a 304 without a database round trip.
+    Invalidation only reaches this process, so cached feeds are also dropped
+    after ``CALENDAR_FEED_MAX_LIFETIME`` seconds to pick up writes handled by
+    other workers.  The body only depends on the data, so an unchanged feed
+    keeps its ETag across re-renders and workers.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._feeds = OrderedDict()
+        self._lock = threading.Lock()
+        # invalidations seen while renders are in flight, so a feed rendered
+        # from data an invalidation has since superseded is not stored
+        self._generation = 0
+        self._rendering = 0
+        self._invalidated = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['calendar_feeds'] = self
+
+    def invalidate(self, kind, obj_id):
+        key = (kind, int(obj_id))
+        with self._lock:
+            self._generation += 1
+            if self._rendering:
+                self._invalidated[key] = self._generation
+            for feed_key in [k for k, feed in self._feeds.items() if key in feed.depends]:
+                del self._feeds[feed_key]
+
+    def response(self, kind, obj_id):
+        key = (kind, obj_id)
+        with self._lock:
+            feed = self._feeds.get(key)
+            if feed is not None and feed.expires <= time.monotonic():
+                del self._feeds[key]
+                feed = None
+            if feed is not None:
+                self._feeds.move_to_end(key)
+            else:
+                generation = self._generation
+                self._rendering += 1
+        if feed is None:
+            try:
+                feed = self._render(kind, obj_id)
+            finally:
+                with self._lock:
+                    self._rendering -= 1
+                    stale = feed is None or any(self._invalidated.get(dep, 0) > generation for dep in feed.depends)
+                    if not self._rendering:
+                        self._invalidated.clear()
+                    if not stale:
+                        feed.expires = time.monotonic() + self.app.config.get('CALENDAR_FEED_MAX_LIFETIME', 600)
+                        self._feeds[key] = feed
+                        while len(self._feeds) > self.app.config.get('CALENDAR_FEED_CACHE_SIZE', 10000):
+                            self._feeds.popitem(last=False)
+            if feed is None:
+                abort(404)
+
+        response = Response(feed.body, mimetype='text/calendar')
+        response.set_etag(feed.etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = self.app.config.get('CALENDAR_FEED_MAX_AGE', 300)
+        return response.make_conditional(request)
+
+    def _render(self, kind, obj_id):
+        if kind == 'venue':
+            entity = Venue.query.with_entities(Venue.id, Venue.name).filter(Venue.id == obj_id).first()
+            shows = Show.query.filter(Show.venue_id == obj_id)
+        else:
+            entity = Artist.query.with_entities(Artist.id, Artist.name).filter(Artist.id == obj_id).first()
+            shows = Show.query.filter(Show.artist_id == obj_id)
+        if entity is None:
+            return None
+        shows = shows.join(Artist).join(Venue).with_entities(
+            Show.id, Show.start_time, Show.venue_id, Show.artist_id, Venue.name.label('venue_name'),
+            Venue.address, Venue.city, Venue.state, Artist.name.label('artist_name')) \
+            .filter(Show.start_time.isnot(None)).order_by(Show.start_time).all()
+
+        depends = {(kind, obj_id)}
+        lines = [
+            'BEGIN:VCALENDAR',
+            'VERSION:2.0',
+            'PRODID:-//Fyyur//Show Calendar//EN',
+            'CALSCALE:GREGORIAN',
+            f'X-WR-CALNAME:{_escape(entity.name)} | Fyyur',
+        ]
+        for show in shows:
+            depends.add(('venue', show.venue_id))
+            depends.add(('artist', show.artist_id))
+            location = ', '.join(part for part in (show.address, show.city, show.state) if part)
+            lines += [
+                'BEGIN:VEVENT',
+                f'UID:show-{show.id}@fyyur',
+                # no revision time is stored; the start time keeps the body, and so the
+                # ETag, identical across re-renders and workers
+                f'DTSTAMP:{_utc(show.start_time)}',
+                f'DTSTART:{_utc(show.start_time)}',
+                f'DURATION:{SHOW_DURATION}',
+                f'SUMMARY:{_escape(show.artist_name)} at {_escape(show.venue_name)}',
+                f'LOCATION:{_escape(location)}',
+                f'URL:{url_for("show_venue", venue_id=show.venue_id, _external=True)}',
+                'END:VEVENT',
+            ]
+        lines.append('END:VCALENDAR')
+        body = ('\r\n'.join(_fold(line) for line in lines) + '\r\n').encode('utf-8')
+        return CachedFeed(body, depends)
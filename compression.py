@@ -0,0 +1,143 @@
+import gzip
+import zlib
+
+from flask import request
+
+from fragment_cache import FragmentStore
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class _Gzip:
+    name = 'gzip'
+
+    @staticmethod
+    def compress(data, level):
+        return gzip.compress(data, compresslevel=level, mtime=0)
+
+    @staticmethod
+    def compressobj(level):
+        stream = zlib.compressobj(level, zlib.DEFLATED, 31)
+        return stream.compress, lambda: stream.flush(zlib.Z_SYNC_FLUSH), stream.flush
+
+
+class _Brotli:
+    name = 'br'
+
+    @staticmethod
+    def compress(data, level):
+        return brotli.compress(data, quality=level)
+
+    @staticmethod
+    def compressobj(level):
+        stream = brotli.Compressor(quality=level)
+        return stream.process, stream.flush, stream.finish
+
+
+class _Zstd:
+    name = 'zstd'
+
+    @staticmethod
+    def compress(data, level):
+        return zstandard.ZstdCompressor(level=level).compress(data)
+
+    @staticmethod
+    def compressobj(level):
+        stream = zstandard.ZstdCompressor(level=level).compressobj()
+        return stream.compress, lambda: stream.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK), stream.flush
+
+
+CODECS = {'gzip': _Gzip}
+if brotli is not None:
+    CODECS['br'] = _Brotli
+if zstandard is not None:
+    CODECS['zstd'] = _Zstd
+
+
+class Compress:
+    """Negotiated gzip / brotli / zstd compression of text responses.
+
+    Codecs are tried in ``COMPRESS_ALGORITHMS`` order; brotli and zstd are used
+    when the ``brotli`` and ``zstandard`` packages are installed.  Bodies under
+    ``COMPRESS_MIN_SIZE`` bytes are left alone, streamed responses are
+    compressed chunk by chunk.  ETags are made weak, so conditional requests
+    keep matching across encodings, and bodies with a strong ETag (such as the
+    cached calendar feeds) are compressed once per encoding and kept in a
+    bounded store.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.cache = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['compress'] = self
+        if not app.config.get('COMPRESS_ENABLED', True):
+            return
+        if app.config.get('COMPRESS_CACHE_MAX_BYTES'):
+            self.cache = FragmentStore(app.config['COMPRESS_CACHE_MAX_BYTES'])
+        app.after_request(self.after_request)
+
+    def _negotiate(self):
+        accepted = request.accept_encodings
+        for name in self.app.config.get('COMPRESS_ALGORITHMS', ('br', 'zstd', 'gzip')):
+            if name in CODECS and accepted[name] > 0:
+                return CODECS[name]
+        return None
+
+    def after_request(self, response):
+        config = self.app.config
+        if response.mimetype not in config['COMPRESS_MIMETYPES'] or 'Content-Encoding' in response.headers:
+            return response
+        response.vary.add('Accept-Encoding')
+        codec = self._negotiate()
+        if codec is None:
+            return response
+
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        if response.status_code != 200 or response.direct_passthrough or request.range:
+            return response
+
+        level = config['COMPRESS_LEVELS'].get(codec.name)
+        if response.is_streamed:
+            response.response = self._stream(codec, level, response.iter_encoded())
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < config['COMPRESS_MIN_SIZE']:
+                return response
+            key = (etag, codec.name) if etag and not weak and self.cache is not None else None
+            compressed = self.cache.get(key) if key else None
+            if compressed is None:
+                compressed = codec.compress(data, level)
+                if key:
+                    self.cache.set(key, compressed)
+            response.set_data(compressed)
+        response.headers['Content-Encoding'] = codec.name
+        return response
+
+    @staticmethod
+    def _stream(codec, level, chunks):
+        compress, flush, finish = codec.compressobj(level)
+        try:
+            for chunk in chunks:
+                data = compress(chunk)
+                # flush per chunk so streamed pages keep reaching the client progressively
+                yield data + flush()
+            yield finish()
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
@@ -0,0 +1,200 @@
+import json
+import os
+import re
+import uuid
+from datetime import datetime
+
+from alembic.script import ScriptDirectory
+from flask import request, current_app
+from sqlalchemy import event, inspect
+from werkzeug.exceptions import HTTPException
+
+from models import db, Venue, Artist
+
+# Columns and expressions the routes filter, join or sort on, beyond the foreign keys
+# found by inspection.  Names are not listed: they are only searched with
+# ILIKE '%term%', which a b-tree index cannot serve.
+RECOMMENDED_INDEXES = [
+    ('Show', ('start_time',)),
+    ('Venue', ('lower(city)', 'state')),
+    ('Artist', ('city', 'state')),
+]
+
+MIGRATION_TEMPLATE = '''"""{message}
+
+Revision ID: {revision}
+Revises: {down_revision}
+Create Date: {create_date}
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '{revision}'
+down_revision = '{down_revision}'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+{upgrade}
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+{downgrade}
+'''
+
+
+def index_name(table, columns):
+    return f'ix_{table}_{"_".join(re.sub(r"[^0-9A-Za-z]+", "_", column).strip("_") for column in columns)}'
+
+
+def _normalize(column):
+    # lower((city)::text) as reflected by PostgreSQL, "city" or lower(city) -> lower(city)
+    column = re.sub(r'::\w+(\s+\w+)*', '', column).replace('"', '').replace(' ', '')
+    while True:
+        stripped = re.sub(r'\((\w+)\)(?=\))', r'\1', column)
+        stripped = re.sub(r'^\((.*)\)$', r'\1', stripped)
+        if stripped == column:
+            return column.lower()
+        column = stripped
+
+
+def _split_columns(body):
+    columns, depth, current = [], 0, ''
+    for char in body:
+        if char == ',' and not depth:
+            columns.append(current.strip())
+            current = ''
+            continue
+        depth += (char == '(') - (char == ')')
+        current += char
+    columns.append(current.strip())
+    return columns
+
+
+def _indexed_columns(connection, inspector, table):
+    """Column tuples of every index on ``table``, expressions included."""
+    if connection.dialect.name == 'sqlite':
+        # the SQLite dialect cannot reflect expression indexes, read their DDL instead
+        rows = connection.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+            (table,)).scalars()
+        indexed = [_split_columns(sql[sql.index('(') + 1:sql.rindex(')')]) for sql in rows]
+    else:
+        indexed = [index.get('expressions') or index['column_names'] for index in inspector.get_indexes(table)]
+    return [tuple(_normalize(column) for column in columns) for columns in indexed]
+
+
+def audited_requests():
+    """The requests whose SQL is audited: every GET route with sample ids, plus the searches."""
+    venue = Venue.query.with_entities(Venue.id).first()
+    artist = Artist.query.with_entities(Artist.id).first()
+    samples = {'venue_id': venue.id if venue else 1, 'artist_id': artist.id if artist else 1}
+    audited = []
+    for rule in current_app.url_map.iter_rules():
+        if 'GET' not in rule.methods or rule.endpoint == 'static' or rule.endpoint.startswith(('admission', 'profile')):
+            continue
+        if not set(rule.arguments) <= set(samples):
+            continue
+        audited.append(('GET', rule.build({k: samples[k] for k in rule.arguments})[1], None))
+    audited.append(('GET', '/shows?from=2000-01-01&to=2100-01-01&city=a&state=CA', None))
+    audited.append(('POST', '/venues/search', {'search_term': 'a'}))
+    audited.append(('POST', '/artists/search', {'search_term': 'a'}))
+    return audited
+
+
+def capture_statements(app):
+    """Run the audited views and return the distinct SELECTs they issue, with parameters."""
+    statements = {}
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.setdefault(statement, parameters)
+
+    engine = db.engine
+    for method, path, data in audited_requests():
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            # call the views directly so admission control and CSRF stay out of the way
+            with app.test_request_context(path, method=method, data=data):
+                try:
+                    app.view_functions[request.url_rule.endpoint](**request.view_args)
+                except HTTPException:
+                    pass
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+            db.session.rollback()
+    return statements
+
+
+def sequential_scans(connection, statement, parameters, analyze=False):
+    """EXPLAIN one statement and return ``(tables scanned sequentially, plan text)``."""
+    if connection.dialect.name == 'postgresql':
+        options = 'ANALYZE, FORMAT JSON' if analyze else 'FORMAT JSON'
+        plan = connection.exec_driver_sql(f'EXPLAIN ({options}) {statement}', parameters).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        scans = []
+        nodes = [plan[0]['Plan']]
+        while nodes:
+            node = nodes.pop()
+            if node['Node Type'] == 'Seq Scan':
+                scans.append(node['Relation Name'])
+            nodes.extend(node.get('Plans', []))
+        return scans, json.dumps(plan, indent=2)
+    rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+    details = [row[-1] for row in rows]
+    # only full scans of real tables: not SCAN CONSTANT ROW, subqueries or co-routines
+    tables = set(inspect(connection).get_table_names())
+    scans = [match.group(1) for match in (re.match(r'SCAN "?(\w+)"?', detail) for detail in details)
+             if match and match.group(1) in tables and 'USING' not in match.string]
+    if scans and re.search(r'\bLIMIT\b', statement, re.I) and not any('TEMP B-TREE' in detail for detail in details):
+        # the outer scan walks rowid order, which is the ORDER BY, and stops at the LIMIT
+        scans = scans[1:]
+    return scans, '\n'.join(details)
+
+
+def missing_indexes(connection):
+    """Foreign keys and recommended columns with no index whose leading columns cover them."""
+    inspector = inspect(connection)
+    missing = []
+    for table in inspector.get_table_names():
+        if table == 'alembic_version':
+            continue
+        indexed = _indexed_columns(connection, inspector, table)
+        indexed.append(tuple(_normalize(column) for column in inspector.get_pk_constraint(table)['constrained_columns']))
+        wanted = [tuple(fk['constrained_columns']) for fk in inspector.get_foreign_keys(table)]
+        wanted += [columns for name, columns in RECOMMENDED_INDEXES if name == table]
+        for columns in wanted:
+            normalized = tuple(_normalize(column) for column in columns)
+            if not any(existing[:len(normalized)] == normalized for existing in indexed):
+                missing.append((table, columns))
+    return missing
+
+
+def _columns_source(columns):
+    return '[' + ', '.join(f'sa.text({column!r})' if '(' in column else repr(column) for column in columns) + ']'
+
+
+def write_migration(directory, indexes, message='add missing indexes'):
+    script = ScriptDirectory(directory)
+    down_revision = script.get_current_head()
+    revision = uuid.uuid4().hex[:12]
+    upgrade = '\n'.join(
+        f"        op.create_index('{index_name(table, columns)}', '{table}', {_columns_source(columns)}, "
+        f"unique=False, postgresql_concurrently=True)"
+        for table, columns in indexes)
+    downgrade = '\n'.join(
+        f"        op.drop_index('{index_name(table, columns)}', table_name='{table}', postgresql_concurrently=True)"
+        for table, columns in reversed(indexes))
+    path = os.path.join(directory, 'versions', f'{revision}_.py')
+    with open(path, 'w') as f:
+        f.write(MIGRATION_TEMPLATE.format(message=message, revision=revision, down_revision=down_revision,
+                                          create_date=datetime.now(), upgrade=upgrade, downgrade=downgrade))
+    return path
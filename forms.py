@@ -1,7 +1,8 @@
 from datetime import datetime
 from flask_wtf import FlaskForm as Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, URL
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, IntegerField
+from wtforms.validators import DataRequired, InputRequired, URL
+from wtforms.widgets import HiddenInput
 from utils import is_valid_phone
 from enums import GenersChoices, StateChoices
 
@@ -135,4 +136,13 @@ class ArtistForm(Form):
             self.phone.errors.append('Invalid phone number.')
             return False
 
-        return True
\ No newline at end of file
+        return True
+
+
+class EditVenueForm(VenueForm):
+    # row version the form was rendered from, checked on update
+    version = IntegerField('version', widget=HiddenInput(), validators=[InputRequired()])
+
+
+class EditArtistForm(ArtistForm):
+    version = IntegerField('version', widget=HiddenInput(), validators=[InputRequired()])
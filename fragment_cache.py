@@ -0,0 +1,98 @@
+import threading
+from collections import OrderedDict
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+
+class FragmentStore:
+    """LRU of rendered fragments (text or bytes), bounded by their total size in bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key, value):
+        size = len(value) if isinstance(value, bytes) else len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            self._items[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self.size -= evicted
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+
+class FragmentCacheExtension(Extension):
+    """``{% cache 'venue-tile', venue.id, venue.version %}...{% endcache %}``
+
+    Caches the rendered body under the given key parts.  Keys should include
+    the version of every entity the fragment shows, so that an edit produces a
+    new key instead of needing an invalidation.
+    """
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_cache_support', [nodes.Tuple(parts, 'load')]),
+                               [], [], body).set_lineno(lineno)
+
+    def _cache_support(self, key, caller):
+        store = self.environment.fragment_cache
+        if store is None:
+            return caller()
+        value = store.get(key)
+        if value is None:
+            value = caller()
+            store.set(key, value)
+        return value
+
+
+class FragmentCache:
+
+    def __init__(self, app=None):
+        self.store = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['fragment_cache'] = self
+        app.jinja_env.add_extension(FragmentCacheExtension)
+        if app.config.get('FRAGMENT_CACHE_MAX_BYTES'):
+            self.store = FragmentStore(app.config['FRAGMENT_CACHE_MAX_BYTES'])
+        app.jinja_env.fragment_cache = self.store
@@ -0,0 +1,141 @@
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from flask import g, request, has_request_context
+from flask.logging import default_handler
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler over a bounded queue that drops records instead of blocking when it is full."""
+
+    def __init__(self, maxsize):
+        super().__init__(queue.Queue(maxsize))
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        # render message and traceback here, the listener thread only formats JSON
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+class RequestContextFilter(logging.Filter):
+    """Tags records logged inside a request with its id, route and elapsed time."""
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.route = request.endpoint
+            record.method = request.method
+            record.path = request.path
+            if 'latency_ms' not in record.__dict__ and 'request_started' in g:
+                record.latency_ms = round((time.perf_counter() - g.request_started) * 1000, 3)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps only a fraction of records per level, e.g. ``{'DEBUG': 0.01, 'INFO': 0.1}``."""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = {logging.getLevelName(level): rate for level, rate in rates.items()}
+
+    def filter(self, record):
+        rate = self.rates.get(record.levelno)
+        return rate is None or rate >= 1 or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    FIELDS = ('request_id', 'route', 'method', 'path', 'status', 'latency_ms')
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'location': f'{record.pathname}:{record.lineno}',
+        }
+        for field in self.FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class LogPipeline:
+    """Moves log I/O off the request threads.
+
+    Records go through a bounded ``DroppingQueueHandler`` on the root logger;
+    a ``QueueListener`` thread writes them as JSON lines to ``LOG_FILE`` with
+    size-based rotation.  Levels listed in ``LOG_SAMPLE_RATES`` are sampled
+    before they are queued, and every request is logged once on completion
+    with its latency.
+    """
+
+    def __init__(self, app=None):
+        self.handler = None
+        self.listener = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['log_pipeline'] = self
+        file_handler = RotatingFileHandler(app.config['LOG_FILE'], maxBytes=app.config['LOG_MAX_BYTES'],
+                                           backupCount=app.config['LOG_BACKUP_COUNT'])
+        file_handler.setFormatter(JsonFormatter())
+
+        self.handler = DroppingQueueHandler(app.config['LOG_QUEUE_SIZE'])
+        self.handler.addFilter(SamplingFilter(app.config.get('LOG_SAMPLE_RATES', {})))
+        self.handler.addFilter(RequestContextFilter())
+        self.listener = QueueListener(self.handler.queue, file_handler)
+        self.listener.start()
+        atexit.register(self.stop)
+
+        root = logging.getLogger()
+        root.setLevel(app.config.get('LOG_LEVEL', logging.INFO))
+        root.addHandler(self.handler)
+        app.logger.removeHandler(default_handler)
+
+        app.before_request(self._start_request)
+        app.after_request(self._log_request)
+
+    def stop(self):
+        """Flush queued records and stop the writer thread."""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    @staticmethod
+    def _start_request():
+        g.request_started = time.perf_counter()
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+
+    def _log_request(self, response):
+        if 'request_started' in g:
+            latency_ms = round((time.perf_counter() - g.request_started) * 1000, 3)
+            logging.getLogger('fyyur.access').info('%s %s %s', request.method, request.path, response.status_code,
+                                                   extra={'status': response.status_code, 'latency_ms': latency_ms})
+            response.headers['X-Request-ID'] = g.request_id
+        return response
@@ -65,7 +65,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        transaction_per_migration=True
     )
 
     with context.begin_transaction():
@@ -97,6 +98,9 @@ def run_migrations_online():
             connection=connection,
             target_metadata=get_metadata(),
             process_revision_directives=process_revision_directives,
+            # one transaction per migration, so a migration building indexes
+            # CONCURRENTLY in an autocommit_block() only commits its own work
+            transaction_per_migration=True,
             **current_app.extensions['migrate'].configure_args
         )
 
@@ -0,0 +1,27 @@
+"""index Show.start_time
+
+Revision ID: 4b7e21c9d3a0
+Revises: 1dd5ca88866a
+Create Date: 2026-10-19 10:12:04.118532
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b7e21c9d3a0'
+down_revision = '1dd5ca88866a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index('ix_Show_start_time', 'Show', ['start_time'], unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_Show_start_time', table_name='Show', postgresql_concurrently=True)
@@ -0,0 +1,37 @@
+"""add missing indexes
+
+Revision ID: a3c9e57b1f02
+Revises: 8d2f6a1e5c47
+Create Date: 2026-10-19 12:20:17.480126
+
+Venue is indexed on lower(city), state for the case-insensitive city filter
+of /shows.  Names are not indexed: a b-tree cannot serve the ILIKE '%term%'
+searches.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c9e57b1f02'
+down_revision = '8d2f6a1e5c47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        op.create_index('ix_Artist_city_state', 'Artist', ['city', 'state'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_Show_artist_id', 'Show', ['artist_id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_Show_venue_id', 'Show', ['venue_id'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_Venue_lower_city_state', 'Venue', [sa.text('lower(city)'), 'state'], unique=False,
+                        postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_Venue_lower_city_state', table_name='Venue', postgresql_concurrently=True)
+        op.drop_index('ix_Show_venue_id', table_name='Show', postgresql_concurrently=True)
+        op.drop_index('ix_Show_artist_id', table_name='Show', postgresql_concurrently=True)
+        op.drop_index('ix_Artist_city_state', table_name='Artist', postgresql_concurrently=True)
@@ -8,6 +8,9 @@ Create Date: 2023-08-12 16:44:30.478221
 from alembic import op
 import sqlalchemy as sa
 
+# text[] on PostgreSQL, JSON elsewhere, see models.GenreList
+genre_list = sa.JSON().with_variant(sa.ARRAY(sa.String(length=255), dimensions=1), 'postgresql')
+
 
 # revision identifiers, used by Alembic.
 revision = 'cf00ac4bc573'
@@ -27,7 +30,7 @@ def upgrade():
     sa.Column('image_link', sa.String(length=500), nullable=True),
     sa.Column('facebook_link', sa.String(length=120), nullable=True),
     sa.Column('seeking_venue', sa.Boolean(), nullable=True),
-    sa.Column('genres', sa.ARRAY(sa.String(length=255), dimensions=1), nullable=True),
+    sa.Column('genres', genre_list, nullable=True),
     sa.Column('seeking_description', sa.String(length=500), nullable=True),
     sa.Column('website_link', sa.String(length=500), nullable=True),
     sa.PrimaryKeyConstraint('id')
@@ -43,7 +46,7 @@ def upgrade():
     sa.Column('website_link', sa.String(length=500), nullable=True),
     sa.Column('facebook_link', sa.String(length=120), nullable=True),
     sa.Column('seeking_talent', sa.Boolean(), nullable=True),
-    sa.Column('genres', sa.ARRAY(sa.String(length=255), dimensions=1), nullable=True),
+    sa.Column('genres', genre_list, nullable=True),
     sa.Column('seeking_description', sa.String(length=500), nullable=True),
     sa.PrimaryKeyConstraint('id')
     )
@@ -0,0 +1,40 @@
+"""never reuse Venue, Artist and Show ids on SQLite
+
+Revision ID: f71c3a9e0d25
+Revises: e5b18d7c2f94
+Create Date: 2026-10-19 18:05:52.906114
+
+Fragment cache keys are (id, version); without AUTOINCREMENT SQLite hands a
+deleted row's id to the next insert.  PostgreSQL sequences never reuse ids,
+so this is a no-op there.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f71c3a9e0d25'
+down_revision = 'e5b18d7c2f94'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist', 'Show')
+
+
+def _rebuild(autoincrement):
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for table in TABLES:
+        with op.batch_alter_table(table, recreate='always',
+                                  table_kwargs={'sqlite_autoincrement': autoincrement}) as batch_op:
+            pass
+    # the copy is built from reflection, which skips expression indexes
+    op.create_index('ix_Venue_lower_city_state', 'Venue', [sa.text('lower(city)'), 'state'], unique=False)
+
+
+def upgrade():
+    _rebuild(True)
+
+
+def downgrade():
+    _rebuild(False)
@@ -1,11 +1,21 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.types import ARRAY
+from sqlalchemy import update, select, func
+from sqlalchemy.types import ARRAY, JSON, String
 
 db = SQLAlchemy()
 
+# Ids are never reused, also on SQLite (AUTOINCREMENT): cached fragments are keyed
+# by (id, version), so a new row must not inherit a deleted row's key.
+NO_ID_REUSE = {'sqlite_autoincrement': True}
+
+# PostgreSQL keeps genres in a native text[]; other backends (SQLite for tests,
+# benchmarks and single-node deployments) store the same list as JSON.
+GenreList = JSON().with_variant(ARRAY(String(255), dimensions=1), 'postgresql')
+
 
 class Venue(db.Model):
     __tablename__ = 'Venue'
+    __table_args__ = NO_ID_REUSE
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
@@ -17,14 +27,20 @@ class Venue(db.Model):
     website = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean)
-    genres = db.Column(ARRAY(db.String(255), dimensions=1))
+    genres = db.Column(GenreList)
     # genres = db.Column(MutableList.as_mutable(ARRAY(db.String(255))), default=[])
     seeking_description = db.Column(db.String(500))
     shows = db.relationship('Show', backref='venue', lazy="joined")
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+
+# /shows filters venues on lower(city) and state
+db.Index('ix_Venue_lower_city_state', func.lower(Venue.city), Venue.state)
 
 
 class Artist(db.Model):
     __tablename__ = 'Artist'
+    __table_args__ = (db.Index('ix_Artist_city_state', 'city', 'state'), NO_ID_REUSE)
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
@@ -34,16 +50,65 @@ class Artist(db.Model):
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean)
-    genres = db.Column(ARRAY(db.String(255), dimensions=1))
+    genres = db.Column(GenreList)
     seeking_description = db.Column(db.String(500))
     website = db.Column(db.String(500))
     shows = db.relationship('Show', backref='artist', lazy="joined")
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
 
 
 class Show(db.Model):
     __tablename__ = 'Show'
+    __table_args__ = NO_ID_REUSE
 
     id = db.Column(db.Integer, primary_key=True)
-    start_time = db.Column(db.DateTime(timezone=True))
-    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'))
-    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'))
+    start_time = db.Column(db.DateTime(timezone=True), index=True)
+    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), index=True)
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), index=True)
+
+
+class CityRollup(db.Model):
+    """Shows per venue city and hour of start time, maintained by ``rollups.Rollups``."""
+    __tablename__ = 'CityRollup'
+
+    bucket = db.Column(db.DateTime(timezone=True), primary_key=True)
+    city = db.Column(db.String(120), primary_key=True)
+    state = db.Column(db.String(120), primary_key=True)
+    shows = db.Column(db.Integer, nullable=False, default=0)
+
+
+class GenreRollup(db.Model):
+    """Shows per artist genre and hour of start time, maintained by ``rollups.Rollups``."""
+    __tablename__ = 'GenreRollup'
+
+    bucket = db.Column(db.DateTime(timezone=True), primary_key=True)
+    genre = db.Column(db.String(255), primary_key=True)
+    shows = db.Column(db.Integer, nullable=False, default=0)
+
+
+def changed_values(before, values):
+    """ The entries of ``values`` that differ from the ``before`` row; all of them when there is no row. """
+    if before is None:
+        return values
+    current = before._mapping
+    return {key: value for key, value in values.items() if current[key] != value}
+
+
+def update_versioned(model, obj_id, version, values):
+    """ Apply ``values`` to one row in a single ``UPDATE ... RETURNING``, without loading it.
+
+    The row is only written if its ``version`` still equals ``version``, so an edit made
+    from a stale form cannot silently overwrite a newer one.  The version is bumped even
+    when ``values`` is empty.  Returns the updated
+    ``(id, name, version)`` row, or ``None`` together with the row's current version
+    (``None`` as well when the row does not exist).
+    """
+    stmt = update(model) \
+        .where(model.id == obj_id, model.version == version) \
+        .values(version=model.version + 1, **values) \
+        .returning(model.id, model.name, model.version) \
+        .execution_options(synchronize_session=False)
+    row = db.session.execute(stmt).first()
+    if row is not None:
+        return row, row.version
+    return None, db.session.execute(select(model.version).where(model.id == obj_id)).scalar()
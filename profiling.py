@@ -0,0 +1,206 @@
+import json
+import os
+import random
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from datetime import datetime
+
+from flask import request, g, abort, render_template, send_from_directory
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+HEADER = 'X-Fyyur-Profile'
+QUERY_ARG = '_profile'
+
+
+class StackSampler(threading.Thread):
+    """Samples one thread's Python stack every ``interval`` seconds into collapsed stacks."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if frames:
+                self.stacks[';'.join(reversed(frames))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+class Capture:
+
+    def __init__(self, sampler):
+        self.sampler = sampler
+        self.started = time.perf_counter()
+        self.statements = []
+
+
+class RequestProfiler:
+    """Opt-in per-request profiling.
+
+    A request is profiled when it carries a token signed with
+    ``PROFILE_SECRET`` (``X-Fyyur-Profile`` header or ``?_profile=``), or at
+    random with probability ``PROFILE_SAMPLE_RATE``.  The view runs under a
+    stack sampler while every SQL statement it issues is recorded with its
+    duration and Python call site.  Results are written to ``PROFILE_DIR`` as a
+    collapsed-stack file (for speedscope or flamegraph.pl) plus a JSON list of
+    statements, and listed at ``/_profiles``.  Requests that are not profiled
+    only pay for a header and argument lookup.  Tokens must validate in every
+    worker, so without ``PROFILE_SECRET`` token profiling and ``/_profiles``
+    are off.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._active = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['profiler'] = self
+        if not app.config.get('PROFILE_ENABLED', True):
+            return
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.add_url_rule('/_profiles', 'profiles', self.index)
+        app.add_url_rule('/_profiles/<path:filename>', 'profile_file', self.download)
+        event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    @property
+    def serializer(self):
+        secret = self.app.config.get('PROFILE_SECRET')
+        return URLSafeTimedSerializer(secret, salt='profile') if secret else None
+
+    def make_token(self):
+        if self.serializer is None:
+            raise RuntimeError('PROFILE_SECRET is not set')
+        return self.serializer.dumps('profile')
+
+    def _authorized(self):
+        token = request.headers.get(HEADER) or request.args.get(QUERY_ARG)
+        if not token or self.serializer is None:
+            return False
+        try:
+            self.serializer.loads(token, max_age=self.app.config.get('PROFILE_TOKEN_MAX_AGE', 3600))
+        except BadSignature:
+            return False
+        return True
+
+    def _start(self):
+        if request.endpoint in ('static', 'profiles', 'profile_file'):
+            return
+        rate = self.app.config.get('PROFILE_SAMPLE_RATE', 0)
+        requested = HEADER in request.headers or QUERY_ARG in request.args
+        if not requested and not (rate and random.random() < rate):
+            return
+        if requested and not self._authorized():
+            return
+        thread_id = threading.get_ident()
+        sampler = StackSampler(thread_id, self.app.config.get('PROFILE_INTERVAL', 0.001))
+        g.profile_capture = self._active[thread_id] = Capture(sampler)
+        sampler.start()
+
+    def _finish(self, response):
+        capture = g.pop('profile_capture', None)
+        if capture is None:
+            return response
+        capture.sampler.stop()
+        self._active.pop(threading.get_ident(), None)
+        elapsed = time.perf_counter() - capture.started
+        response.headers['X-Fyyur-Profile-Id'] = self._write(capture, elapsed)
+        return response
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        capture = self._active.get(threading.get_ident())
+        if capture is None:
+            return
+        stack = [f'{frame.filename}:{frame.lineno} in {frame.name}'
+                 for frame in traceback.extract_stack()[:-1]
+                 if 'site-packages' not in frame.filename]
+        capture.statements.append({'statement': statement, 'stack': stack, 'started': time.perf_counter()})
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        capture = self._active.get(threading.get_ident())
+        if capture is None or not capture.statements:
+            return
+        entry = capture.statements[-1]
+        entry['duration_ms'] = round((time.perf_counter() - entry.pop('started')) * 1000, 3)
+
+    def _write(self, capture, elapsed):
+        directory = self.app.config['PROFILE_DIR']
+        os.makedirs(directory, exist_ok=True)
+        name = f'{datetime.now():%Y%m%d-%H%M%S-%f}-{request.endpoint or "unknown"}'
+        with open(os.path.join(directory, f'{name}.collapsed'), 'w') as f:
+            for stack, count in capture.sampler.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+        with open(os.path.join(directory, f'{name}.json'), 'w') as f:
+            json.dump({
+                'method': request.method,
+                'path': request.full_path,
+                'endpoint': request.endpoint,
+                'elapsed_ms': round(elapsed * 1000, 3),
+                'samples': sum(capture.sampler.stacks.values()),
+                'interval_ms': capture.sampler.interval * 1000,
+                'sql': capture.statements,
+            }, f, indent=2)
+        self._prune(directory)
+        return name
+
+    def _prune(self, directory):
+        keep = self.app.config.get('PROFILE_KEEP', 100)
+        names = sorted({os.path.splitext(f)[0] for f in os.listdir(directory)}, reverse=True)
+        for name in names[keep:]:
+            for ext in ('.collapsed', '.json'):
+                path = os.path.join(directory, name + ext)
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _captures(self):
+        directory = self.app.config['PROFILE_DIR']
+        if not os.path.isdir(directory):
+            return []
+        captures = []
+        for filename in sorted(os.listdir(directory), reverse=True):
+            if not filename.endswith('.json'):
+                continue
+            with open(os.path.join(directory, filename)) as f:
+                meta = json.load(f)
+            captures.append({
+                'name': filename[:-len('.json')],
+                'path': meta['path'],
+                'endpoint': meta['endpoint'],
+                'elapsed_ms': meta['elapsed_ms'],
+                'samples': meta['samples'],
+                'sql_count': len(meta['sql']),
+                'sql_ms': round(sum(s.get('duration_ms', 0) for s in meta['sql']), 3),
+            })
+        return captures
+
+    def index(self):
+        if not self._authorized():
+            abort(404)
+        return render_template('pages/profiles.html', captures=self._captures(),
+                               token=request.headers.get(HEADER) or request.args.get(QUERY_ARG))
+
+    def download(self, filename):
+        if not self._authorized():
+            abort(404)
+        return send_from_directory(self.app.config['PROFILE_DIR'], filename, mimetype='text/plain')
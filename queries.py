@@ -0,0 +1,90 @@
+"""Pre-built statements for the hot routes.
+
+Every statement here is constructed once at import and executed with bound
+parameters, so a request pays neither for building a ``Query`` nor for
+compiling SQL: SQLAlchemy memoizes each statement's cache key and reuses the
+compiled form from the engine's compiled cache.  Statements whose shape
+depends on the request (optional filters) are built once per combination of
+filters and kept, so their variants hit the cache too.
+"""
+from sqlalchemy import select, bindparam, func
+
+from models import db, Venue, Artist, Show
+
+VENUE_AREAS = select(Venue.city, Venue.state, Venue.name, Venue.id, Venue.version, func.count(Venue.id)) \
+    .group_by(Venue.city, Venue.state, Venue.name, Venue.id, Venue.version)
+
+ARTIST_LIST = select(Artist.id, Artist.name, Artist.version)
+
+SEARCH_VENUES = select(Venue.id, Venue.name).where(Venue.name.ilike(bindparam('pattern')))
+
+SEARCH_ARTISTS = select(Artist.id, Artist.name).where(Artist.name.ilike(bindparam('pattern')))
+
+VENUE_DETAIL = select(
+    Venue.id, Venue.name, Venue.genres, Venue.address, Venue.city, Venue.state, Venue.phone, Venue.website,
+    Venue.facebook_link, Venue.seeking_talent, Venue.seeking_description, Venue.image_link, Venue.version,
+).where(Venue.id == bindparam('venue_id'))
+
+VENUE_SHOWS = select(
+    Show.id, Show.start_time, Show.artist_id, Artist.name.label('artist_name'),
+    Artist.image_link.label('artist_image_link'), Artist.version.label('artist_version'),
+).join(Artist, Show.artist_id == Artist.id) \
+    .where(Show.venue_id == bindparam('venue_id')).order_by(Show.start_time)
+
+ARTIST_DETAIL = select(
+    Artist.id, Artist.name, Artist.genres, Artist.city, Artist.state, Artist.phone, Artist.website,
+    Artist.facebook_link, Artist.seeking_venue, Artist.seeking_description, Artist.image_link, Artist.version,
+).where(Artist.id == bindparam('artist_id'))
+
+ARTIST_SHOWS = select(
+    Show.id, Show.start_time, Show.venue_id, Venue.name.label('venue_name'),
+    Venue.image_link.label('venue_image_link'), Venue.version.label('venue_version'),
+).join(Venue, Show.venue_id == Venue.id) \
+    .where(Show.artist_id == bindparam('artist_id')).order_by(Show.start_time)
+
+# the editable columns as the edit form saw them; FOR UPDATE holds the row until the versioned UPDATE
+VENUE_AT_VERSION = select(
+    Venue.name, Venue.genres, Venue.address, Venue.city, Venue.state, Venue.phone, Venue.website,
+    Venue.facebook_link, Venue.seeking_talent, Venue.seeking_description, Venue.image_link,
+).where(Venue.id == bindparam('venue_id'), Venue.version == bindparam('version')).with_for_update()
+
+ARTIST_AT_VERSION = select(
+    Artist.name, Artist.genres, Artist.city, Artist.state, Artist.phone, Artist.website,
+    Artist.facebook_link, Artist.seeking_venue, Artist.seeking_description, Artist.image_link,
+).where(Artist.id == bindparam('artist_id'), Artist.version == bindparam('version')).with_for_update()
+
+VENUES_BY_IDS = select(Venue.id, Venue.name, Venue.version).where(Venue.id.in_(bindparam('ids', expanding=True)))
+
+ARTISTS_BY_IDS = select(Artist.id, Artist.name, Artist.image_link, Artist.version) \
+    .where(Artist.id.in_(bindparam('ids', expanding=True)))
+
+SHOW_LISTING = select(
+    Show.id, Show.venue_id, Venue.name.label('venue_name'), Venue.version.label('venue_version'),
+    Show.artist_id, Artist.name.label('artist_name'), Artist.image_link.label('artist_image_link'),
+    Artist.version.label('artist_version'), Show.start_time,
+).join(Artist, Show.artist_id == Artist.id).join(Venue, Show.venue_id == Venue.id)
+
+
+def execute(statement, **params):
+    return db.session.execute(statement, params)
+
+
+_SHOW_FILTERS = (
+    ('start', lambda: Show.start_time >= bindparam('start')),
+    ('end', lambda: Show.start_time < bindparam('end')),
+    ('city', lambda: func.lower(Venue.city) == bindparam('city')),
+    ('state', lambda: Venue.state == bindparam('state')),
+)
+_show_listings = {}
+
+
+def shows_between(start=None, end=None, city=None, state=None):
+    """The SQL path of ``/shows``, one pre-built statement per combination of filters."""
+    params = {'start': start, 'end': end, 'city': city.lower() if city else None, 'state': state}
+    key = tuple(params[name] is not None for name, _ in _SHOW_FILTERS)
+    statement = _show_listings.get(key)
+    if statement is None:
+        statement = SHOW_LISTING.where(*(criterion() for (_, criterion), used in zip(_SHOW_FILTERS, key) if used)) \
+            .order_by(Show.start_time)
+        _show_listings[key] = statement
+    return execute(statement, **{name: value for name, value in params.items() if value is not None}).all()
@@ -0,0 +1,192 @@
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, delete, update, insert, func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, Venue, Artist, Show, CityRollup, GenreRollup
+
+UPSERTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+
+def hour_bucket(start_time):
+    return start_time.replace(minute=0, second=0, microsecond=0)
+
+
+def _aggregate(rows):
+    cities = Counter()
+    genres = Counter()
+    for start_time, city, state, artist_genres in rows:
+        bucket = hour_bucket(start_time)
+        cities[bucket, city or '', state or ''] += 1
+        for genre in set(artist_genres or ()):
+            genres[bucket, genre] += 1
+    return cities, genres
+
+
+def _upsert(model, keys, counts):
+    if not counts:
+        return
+    table = model.__table__
+    rows = [dict(zip(keys, key), shows=shows) for key, shows in counts.items()]
+    upsert = UPSERTS.get(db.session.get_bind().dialect.name)
+    if upsert is not None:
+        stmt = upsert(table)
+        stmt = stmt.on_conflict_do_update(index_elements=keys, set_={'shows': table.c.shows + stmt.excluded.shows})
+        db.session.execute(stmt, rows)
+        return
+    for row in rows:
+        match = [table.c[key] == row[key] for key in keys]
+        result = db.session.execute(update(table).where(*match).values(shows=table.c.shows + row['shows']))
+        if not result.rowcount:
+            db.session.execute(insert(table).values(**row))
+
+
+class Rollups:
+    """Hourly show counts per city and per genre behind the home page dashboard.
+
+    The write handlers apply the shows they add, move or delete to the
+    ``CityRollup`` and ``GenreRollup`` tables inside their own transaction;
+    edits only do so when their versioned UPDATE went through and changed a
+    venue's place or an artist's genres.  ``flask fyyur rollup-backfill``
+    rebuilds both tables from the Show, Venue and Artist tables.  The
+    dashboard only reads the rollups and is kept in memory for
+    ``ROLLUP_DASHBOARD_TTL`` seconds.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._dashboard = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['rollups'] = self
+
+    @staticmethod
+    def _shows(*criteria):
+        return select(Show.start_time, Venue.city, Venue.state, Artist.genres) \
+            .join(Venue, Show.venue_id == Venue.id).join(Artist, Show.artist_id == Artist.id) \
+            .where(Show.start_time.isnot(None), *criteria)
+
+    def _write(self, cities, genres):
+        _upsert(CityRollup, ('bucket', 'city', 'state'), cities)
+        _upsert(GenreRollup, ('bucket', 'genre'), genres)
+        if any(n < 0 for n in cities.values()):
+            db.session.execute(delete(CityRollup).where(CityRollup.shows <= 0))
+        if any(n < 0 for n in genres.values()):
+            db.session.execute(delete(GenreRollup).where(GenreRollup.shows <= 0))
+        with self._lock:
+            self._dashboard = None
+
+    def _buckets(self, *criteria):
+        return Counter(hour_bucket(row.start_time) for row in db.session.execute(self._shows(*criteria)))
+
+    def add_shows(self, *criteria):
+        """Count the shows matching ``criteria`` in the rollups; the caller commits."""
+        cities, genres = _aggregate(db.session.execute(self._shows(*criteria)))
+        self._write(cities, genres)
+
+    def remove_shows(self, *criteria):
+        """Take the shows matching ``criteria`` out of the rollups; the caller commits."""
+        cities, genres = _aggregate(db.session.execute(self._shows(*criteria)))
+        self._write({k: -n for k, n in cities.items()}, {k: -n for k, n in genres.items()})
+
+    def move_venue(self, venue_id, old_place, new_place):
+        """Move a venue's shows from the ``(city, state)`` it had to the one it has; the caller commits.
+
+        ``old_place`` must be read at the version the edit replaced, so
+        concurrent edits of the venue cannot move the same shows twice.
+        """
+        old_place = tuple(value or '' for value in old_place)
+        new_place = tuple(value or '' for value in new_place)
+        if old_place == new_place:
+            return
+        cities = Counter()
+        for bucket, shows in self._buckets(Show.venue_id == venue_id).items():
+            cities[(bucket,) + old_place] -= shows
+            cities[(bucket,) + new_place] += shows
+        self._write(cities, {})
+
+    def regenre_artist(self, artist_id, old_genres, new_genres):
+        """Move an artist's shows from the genres it had to the ones it has; the caller commits."""
+        removed = set(old_genres or ()) - set(new_genres or ())
+        added = set(new_genres or ()) - set(old_genres or ())
+        if not removed and not added:
+            return
+        genres = Counter()
+        for bucket, shows in self._buckets(Show.artist_id == artist_id).items():
+            for genre in removed:
+                genres[bucket, genre] -= shows
+            for genre in added:
+                genres[bucket, genre] += shows
+        self._write({}, genres)
+
+    def backfill(self):
+        """Rebuild both rollup tables from the raw tables in one transaction."""
+        db.session.execute(delete(CityRollup))
+        db.session.execute(delete(GenreRollup))
+        rows = db.session.execute(self._shows().execution_options(yield_per=5000))
+        cities, genres = _aggregate(rows)
+        _upsert(CityRollup, ('bucket', 'city', 'state'), cities)
+        _upsert(GenreRollup, ('bucket', 'genre'), genres)
+        db.session.commit()
+        with self._lock:
+            self._dashboard = None
+        return sum(cities.values())
+
+    def dashboard(self):
+        with self._lock:
+            cached = self._dashboard
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        data = self._build_dashboard()
+        with self._lock:
+            self._dashboard = (time.monotonic() + self.app.config.get('ROLLUP_DASHBOARD_TTL', 60), data)
+        return data
+
+    def _build_dashboard(self):
+        config = self.app.config
+        limit = config.get('ROLLUP_DASHBOARD_LIMIT', 5)
+        now = hour_bucket(datetime.now())
+        week_start = now.replace(hour=0) - timedelta(days=now.weekday())
+        first_week = week_start - timedelta(weeks=config.get('ROLLUP_WEEKS_BEFORE', 4))
+        weeks = [first_week + timedelta(weeks=i)
+                 for i in range(config.get('ROLLUP_WEEKS_BEFORE', 4) + config.get('ROLLUP_WEEKS_AFTER', 8))]
+
+        city_total = func.sum(CityRollup.shows).label('shows')
+        busiest_cities = db.session.execute(
+            select(CityRollup.city, CityRollup.state, city_total)
+            .where(CityRollup.bucket >= now)
+            .group_by(CityRollup.city, CityRollup.state)
+            .order_by(city_total.desc()).limit(limit)).all()
+        genre_total = func.sum(GenreRollup.shows).label('shows')
+        top_genres = db.session.execute(
+            select(GenreRollup.genre, genre_total)
+            .where(GenreRollup.bucket >= now)
+            .group_by(GenreRollup.genre)
+            .order_by(genre_total.desc()).limit(limit)).all()
+
+        per_week = dict.fromkeys(weeks, 0)
+        hourly = db.session.execute(
+            select(CityRollup.bucket, func.sum(CityRollup.shows))
+            .where(CityRollup.bucket >= weeks[0], CityRollup.bucket < weeks[-1] + timedelta(weeks=1))
+            .group_by(CityRollup.bucket))
+        for bucket, shows in hourly:
+            bucket = bucket.replace(tzinfo=None)
+            per_week[first_week + timedelta(weeks=(bucket - first_week) // timedelta(weeks=1))] += shows
+
+        return {
+            'recent_venues': db.session.execute(
+                select(Venue.id, Venue.name, Venue.city, Venue.state).order_by(Venue.id.desc()).limit(limit)).all(),
+            'recent_artists': db.session.execute(
+                select(Artist.id, Artist.name, Artist.city, Artist.state).order_by(Artist.id.desc()).limit(limit)).all(),
+            'busiest_cities': busiest_cities,
+            'top_genres': top_genres,
+            'shows_per_week': [{'week': week, 'shows': per_week[week], 'current': week == week_start}
+                               for week in weeks],
+        }
@@ -0,0 +1,190 @@
+import bisect
+import logging
+import threading
+from operator import itemgetter
+
+from models import Venue, Artist
+
+logger = logging.getLogger(__name__)
+
+
+class PrefixIndex:
+    """Sorted-array prefix index over venue and artist names, cities and genres.
+
+    Terms are kept lowercased in one sorted list with a parallel list of
+    references, so a lookup is a bisect plus a short forward scan.
+    """
+
+    def __init__(self):
+        self._terms = []
+        self._refs = []
+        self._labels = {}
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._labels)
+
+    @staticmethod
+    def _tokens(value):
+        # index every word start so "hall" finds "The Musical Hop Hall"
+        words = value.lower().split()
+        return {' '.join(words[i:]) for i in range(len(words))}
+
+    def _entries_for(self, kind, obj_id, name, city, genres):
+        fields = [('name', name), ('city', city)] + [('genre', genre) for genre in genres or []]
+        return [(term, (kind, obj_id, field, value))
+                for field, value in fields if value
+                for term in self._tokens(value)]
+
+    def upsert(self, kind, obj_id, name, city=None, genres=None):
+        key = (kind, obj_id)
+        self.remove(kind, obj_id)
+        entries = self._entries_for(kind, obj_id, name, city, genres)
+        for term, ref in entries:
+            idx = bisect.bisect_right(self._terms, term)
+            self._terms.insert(idx, term)
+            self._refs.insert(idx, ref)
+        self._labels[key] = name
+        self._entries[key] = entries
+
+    @classmethod
+    def build(cls, rows):
+        """Index ``(kind, id, name, city, genres)`` rows with a single sort, for full rebuilds."""
+        index = cls()
+        pairs = []
+        for kind, obj_id, name, city, genres in rows:
+            entries = index._entries_for(kind, obj_id, name, city, genres)
+            index._labels[(kind, obj_id)] = name
+            index._entries[(kind, obj_id)] = entries
+            pairs.extend(entries)
+        pairs.sort(key=itemgetter(0))
+        index._terms = [term for term, _ in pairs]
+        index._refs = [ref for _, ref in pairs]
+        return index
+
+    def remove(self, kind, obj_id):
+        key = (kind, obj_id)
+        for term, ref in self._entries.pop(key, []):
+            idx = bisect.bisect_left(self._terms, term)
+            while idx < len(self._terms) and self._terms[idx] == term:
+                if self._refs[idx] == ref:
+                    del self._terms[idx]
+                    del self._refs[idx]
+                    break
+                idx += 1
+        self._labels.pop(key, None)
+
+    def lookup(self, prefix, limit=10, kind=None):
+        """Up to ``limit`` entities with a term starting with ``prefix``, only of ``kind`` when given."""
+        prefix = ' '.join(prefix.lower().split())
+        if not prefix:
+            return []
+        results = []
+        seen = set()
+        idx = bisect.bisect_left(self._terms, prefix)
+        while idx < len(self._terms) and len(results) < limit:
+            if not self._terms[idx].startswith(prefix):
+                break
+            ref_kind, obj_id, field, value = self._refs[idx]
+            idx += 1
+            if (kind and ref_kind != kind) or (ref_kind, obj_id) in seen:
+                continue
+            seen.add((ref_kind, obj_id))
+            results.append({
+                'type': ref_kind,
+                'id': obj_id,
+                'name': self._labels[(ref_kind, obj_id)],
+                'field': field,
+                'match': value,
+            })
+        return results
+
+
+class Autocomplete:
+    """Flask extension owning the live PrefixIndex.
+
+    With ``AUTOCOMPLETE_PRELOAD`` the index is loaded in a background thread
+    started by the first request (not at import, so CLI commands and pre-fork
+    masters never run it), kept current by the create/edit/delete handlers and
+    rebuilt from the database every ``AUTOCOMPLETE_RESYNC_INTERVAL`` seconds,
+    or loaded once when that is 0.  Lookups never touch the
+    database.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.index = PrefixIndex()
+        self._lock = threading.Lock()
+        self._journal = None
+        self._stopped = threading.Event()
+        self._started = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['autocomplete'] = self
+        if app.config.get('AUTOCOMPLETE_PRELOAD', True):
+            app.before_request(self._start)
+
+    def _start(self):
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._resync_loop, name='autocomplete-resync', daemon=True).start()
+
+    def _resync_loop(self):
+        interval = self.app.config.get('AUTOCOMPLETE_RESYNC_INTERVAL', 0)
+        while True:
+            try:
+                with self.app.app_context():
+                    self.load()
+            except Exception:
+                # keep the loop alive, the next resync will try again
+                logger.warning('Autocomplete index resync failed', exc_info=True)
+            if not interval or self._stopped.wait(interval):
+                return
+
+    def load(self):
+        """Rebuild the index from the database and swap it in."""
+        with self._lock:
+            self._journal = []
+        try:
+            venues = Venue.query.with_entities(Venue.id, Venue.name, Venue.city, Venue.genres).all()
+            artists = Artist.query.with_entities(Artist.id, Artist.name, Artist.city, Artist.genres).all()
+            index = PrefixIndex.build(
+                [('venue', v.id, v.name, v.city, v.genres) for v in venues]
+                + [('artist', a.id, a.name, a.city, a.genres) for a in artists])
+        except Exception:
+            with self._lock:
+                self._journal = None
+            raise
+        with self._lock:
+            # replay writes that raced with the snapshot query
+            for method, args in self._journal:
+                getattr(index, method)(*args)
+            self._journal = None
+            self.index = index
+
+    def stop(self):
+        self._stopped.set()
+
+    def _apply(self, method, *args):
+        with self._lock:
+            getattr(self.index, method)(*args)
+            if self._journal is not None:
+                self._journal.append((method, args))
+
+    def upsert(self, kind, obj_id, name, city=None, genres=None):
+        self._apply('upsert', kind, obj_id, name, city, genres)
+
+    def remove(self, kind, obj_id):
+        self._apply('remove', kind, obj_id)
+
+    def lookup(self, prefix, limit=None, kind=None):
+        limit = limit or self.app.config.get('AUTOCOMPLETE_LIMIT', 10)
+        with self._lock:
+            return self.index.lookup(prefix, limit, kind)
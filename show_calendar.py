@@ -0,0 +1,153 @@
+import bisect
+import logging
+import threading
+from array import array
+from datetime import datetime, timezone
+
+from models import Venue, Show
+
+logger = logging.getLogger(__name__)
+
+
+class ShowCalendar:
+    """Time-ordered, array-backed snapshot of every show.
+
+    Each show costs four 8-byte slots (start timestamp, show, venue and artist
+    id) kept in parallel arrays sorted by start time, so range queries are two
+    bisects and a slice.  Venue city/state is kept on the side for filtering.
+    The snapshot loads in a background thread started by the first request;
+    until it is ``ready`` callers fall back to the indexed SQL path on
+    ``Show.start_time``.  Writes handled by this process are applied at once;
+    the snapshot is rebuilt every ``SHOW_CALENDAR_RESYNC_INTERVAL`` seconds to
+    pick up those handled by other workers.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.ready = False
+        self._times = array('d')
+        self._show_ids = array('q')
+        self._venue_ids = array('q')
+        self._artist_ids = array('q')
+        self._places = {}
+        self._lock = threading.Lock()
+        self._journal = None
+        self._started = False
+        self._stopped = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['show_calendar'] = self
+        if app.config.get('SHOW_CALENDAR_PRELOAD'):
+            app.before_request(self._start)
+
+    def _start(self):
+        # on the first request rather than at import, so CLI commands and a
+        # pre-fork master never start it
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._resync_loop, name='show-calendar-resync', daemon=True).start()
+
+    def __len__(self):
+        return len(self._times)
+
+    def _resync_loop(self):
+        interval = self.app.config.get('SHOW_CALENDAR_RESYNC_INTERVAL', 0)
+        while True:
+            try:
+                with self.app.app_context():
+                    self.load()
+            except Exception:
+                # /shows stays on SQL, or on the previous snapshot, until the next resync
+                logger.warning('Show calendar load failed', exc_info=True)
+            if not interval or self._stopped.wait(interval):
+                return
+
+    def stop(self):
+        self._stopped.set()
+
+    def load(self):
+        with self._lock:
+            self._journal = []
+        try:
+            places = {v.id: (v.city, v.state) for v in
+                      Venue.query.with_entities(Venue.id, Venue.city, Venue.state)}
+            rows = Show.query.with_entities(Show.start_time, Show.id, Show.venue_id, Show.artist_id) \
+                .filter(Show.start_time.isnot(None)).order_by(Show.start_time, Show.id).all()
+        except Exception:
+            with self._lock:
+                self._journal = None
+            raise
+        with self._lock:
+            self._times = array('d', (row.start_time.timestamp() for row in rows))
+            self._show_ids = array('q', (row.id for row in rows))
+            self._venue_ids = array('q', (row.venue_id or 0 for row in rows))
+            self._artist_ids = array('q', (row.artist_id or 0 for row in rows))
+            self._places = places
+            for method, args in self._journal:
+                getattr(self, method)(*args)
+            self._journal = None
+            self.ready = True
+
+    def _record(self, method, *args):
+        if self._journal is not None:
+            self._journal.append((method, args))
+
+    def _add(self, show_id, start_time, venue_id, artist_id):
+        ts = start_time.timestamp()
+        idx = bisect.bisect_left(self._times, ts)
+        while idx < len(self._times) and self._times[idx] == ts:
+            if self._show_ids[idx] == show_id:
+                # already picked up by the snapshot query
+                return
+            idx += 1
+        self._times.insert(idx, ts)
+        self._show_ids.insert(idx, show_id)
+        self._venue_ids.insert(idx, venue_id)
+        self._artist_ids.insert(idx, artist_id)
+
+    def _set_place(self, venue_id, city, state):
+        self._places[venue_id] = (city, state)
+
+    def _drop_place(self, venue_id):
+        self._places.pop(venue_id, None)
+
+    def add_show(self, show_id, start_time, venue_id, artist_id):
+        with self._lock:
+            self._add(show_id, start_time, venue_id, artist_id)
+            self._record('_add', show_id, start_time, venue_id, artist_id)
+
+    def set_venue_place(self, venue_id, city, state):
+        with self._lock:
+            self._set_place(venue_id, city, state)
+            self._record('_set_place', venue_id, city, state)
+
+    def remove_venue(self, venue_id):
+        with self._lock:
+            self._drop_place(venue_id)
+            self._record('_drop_place', venue_id)
+
+    def between(self, start=None, end=None, city=None, state=None):
+        """Return ``(show_id, start_time, venue_id, artist_id)`` tuples ordered by start time,
+        for shows starting in ``[start, end)`` at a venue matching ``city`` and ``state``.
+        ``start_time`` is an aware UTC datetime."""
+        with self._lock:
+            lo = bisect.bisect_left(self._times, start.timestamp()) if start else 0
+            hi = bisect.bisect_left(self._times, end.timestamp()) if end else len(self._times)
+            venues = None
+            if city or state:
+                city = city.lower() if city else None
+                venues = {vid for vid, (v_city, v_state) in self._places.items()
+                          if (not city or (v_city or '').lower() == city) and (not state or v_state == state)}
+            return [
+                (self._show_ids[i], datetime.fromtimestamp(self._times[i], timezone.utc),
+                 self._venue_ids[i], self._artist_ids[i])
+                for i in range(lo, hi)
+                if venues is None or self._venue_ids[i] in venues
+            ]
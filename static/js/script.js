@@ -2,3 +2,30 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+document.addEventListener('DOMContentLoaded', function () {
+  var list = document.getElementById('autocomplete-suggestions');
+  var inputs = document.querySelectorAll('input[data-autocomplete]');
+  Array.prototype.forEach.call(inputs, function (input) {
+    var pending = null;
+    input.addEventListener('input', function () {
+      var q = input.value.trim();
+      if (pending) pending.abort();
+      if (!q) { list.innerHTML = ''; return; }
+      var kind = input.getAttribute('data-autocomplete');
+      pending = new XMLHttpRequest();
+      pending.open('GET', '/autocomplete?type=' + kind + '&q=' + encodeURIComponent(q));
+      pending.onload = function () {
+        if (pending.status !== 200) return;
+        list.innerHTML = '';
+        JSON.parse(pending.responseText).forEach(function (item) {
+          var option = document.createElement('option');
+          option.value = item.name;
+          if (item.field !== 'name') option.label = item.name + ' (' + item.match + ')';
+          list.appendChild(option);
+        });
+      };
+      pending.send();
+    });
+  });
+});
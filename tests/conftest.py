@@ -0,0 +1,35 @@
+import os
+
+import pytest
+
+os.environ['DATABASE_URL'] = 'sqlite://'
+import config  # noqa: E402
+
+config.SQLALCHEMY_DATABASE_URI = 'sqlite://'
+config.DEBUG = True
+config.WTF_CSRF_ENABLED = False
+config.ADMISSION_ENABLED = False
+config.AUTOCOMPLETE_PRELOAD = False
+config.SHOW_CALENDAR_PRELOAD = False
+config.PROFILE_ENABLED = False
+# ids restart with every test database, so nothing may be cached by id across tests
+config.FRAGMENT_CACHE_MAX_BYTES = 0
+
+import app as fyyur  # noqa: E402
+from models import db  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    with fyyur.app.app_context():
+        db.create_all()
+    yield fyyur.app
+    with fyyur.app.app_context():
+        db.session.remove()
+        db.drop_all()
+    fyyur.calendar_feeds._feeds.clear()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as fyyur
+from models import db, Venue, Artist, Show
+
+
+@pytest.fixture
+def venue_id(app):
+    with app.app_context():
+        venue = Venue(name='The Hop', city='San Francisco', state='CA')
+        artist = Artist(name='Guns N Petals')
+        db.session.add_all([venue, artist])
+        db.session.flush()
+        db.session.add(Show(venue_id=venue.id, artist_id=artist.id, start_time=datetime(2030, 5, 21, 21, 30)))
+        db.session.commit()
+        return venue.id
+
+
+def test_unchanged_feed_keeps_its_etag_after_expiry(app, client, venue_id, monkeypatch):
+    first = client.get(f'/venues/{venue_id}/calendar.ics')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+
+    monkeypatch.setitem(app.config, 'CALENDAR_FEED_MAX_LIFETIME', 0)
+    fyyur.calendar_feeds.invalidate('venue', venue_id)
+    rendered = client.get(f'/venues/{venue_id}/calendar.ics')
+    assert rendered.headers['ETag'] == etag
+    assert rendered.data == first.data
+
+    response = client.get(f'/venues/{venue_id}/calendar.ics', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+
+
+def test_new_show_changes_the_etag(app, client, venue_id):
+    etag = client.get(f'/venues/{venue_id}/calendar.ics').headers['ETag']
+    with app.app_context():
+        db.session.add(Show(venue_id=venue_id, artist_id=1, start_time=datetime(2030, 6, 1) + timedelta(hours=20)))
+        db.session.commit()
+    fyyur.calendar_feeds.invalidate('venue', venue_id)
+
+    response = client.get(f'/venues/{venue_id}/calendar.ics', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
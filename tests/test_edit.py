@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, select
+
+import app as fyyur
+from models import db, Venue, Artist, Show, CityRollup, GenreRollup
+
+LINK = 'https://example.com/'
+
+
+@pytest.fixture
+def listing(app):
+    with app.app_context():
+        venue = Venue(name='The Hop', city='San Francisco', state='CA', address='1 Main St', phone='123-456-7890',
+                      genres=['Jazz'])
+        artist = Artist(name='Guns N Petals', city='San Francisco', state='CA', phone='123-456-7890',
+                        genres=['Rock n Roll'])
+        db.session.add_all([venue, artist])
+        db.session.flush()
+        db.session.add(Show(venue_id=venue.id, artist_id=artist.id, start_time=datetime.now() + timedelta(days=3)))
+        db.session.commit()
+        fyyur.rollups.backfill()
+        return venue.id, artist.id
+
+
+def venue_form(version, city='Oakland', **values):
+    return {'name': 'The Hop', 'city': city, 'state': 'CA', 'address': '1 Main St', 'phone': '123-456-7890',
+            'genres': ['Jazz'], 'facebook_link': LINK, 'image_link': LINK, 'website': LINK,
+            'seeking_description': '', 'version': str(version), **values}
+
+
+def artist_form(version, genres=('Folk',), **values):
+    return {'name': 'Guns N Petals', 'city': 'San Francisco', 'state': 'CA', 'phone': '123-456-7890',
+            'genres': list(genres), 'facebook_link': LINK, 'image_link': LINK, 'website': LINK,
+            'seeking_description': '', 'version': str(version), **values}
+
+
+def rollups(app):
+    with app.app_context():
+        return (sorted(map(tuple, db.session.execute(select(CityRollup.city, CityRollup.shows)))),
+                sorted(map(tuple, db.session.execute(select(GenreRollup.genre, GenreRollup.shows)))))
+
+
+def row(app, model, obj_id):
+    with app.app_context():
+        return db.session.execute(select(model.city, model.genres, model.version).where(model.id == obj_id)).first()
+
+
+def test_edit_venue_bumps_version(app, client, listing):
+    venue_id, _ = listing
+    response = client.post(f'/venues/{venue_id}/edit', data=venue_form(1))
+    assert response.status_code == 302
+    assert row(app, Venue, venue_id) == ('Oakland', ['Jazz'], 2)
+    assert rollups(app)[0] == [('Oakland', 1)]
+
+
+def test_edit_artist_bumps_version(app, client, listing):
+    _, artist_id = listing
+    response = client.post(f'/artists/{artist_id}/edit', data=artist_form(1))
+    assert response.status_code == 302
+    assert row(app, Artist, artist_id) == ('San Francisco', ['Folk'], 2)
+    assert rollups(app)[1] == [('Folk', 1)]
+
+
+def test_stale_venue_edit_conflicts_and_writes_nothing(app, client, listing):
+    venue_id, _ = listing
+    assert client.post(f'/venues/{venue_id}/edit', data=venue_form(1)).status_code == 302
+    before = rollups(app)
+
+    response = client.post(f'/venues/{venue_id}/edit', data=venue_form(1, city='Berkeley'))
+    assert response.status_code == 409
+    assert row(app, Venue, venue_id) == ('Oakland', ['Jazz'], 2)
+    assert rollups(app) == before
+
+
+def test_stale_artist_edit_conflicts_and_writes_nothing(app, client, listing):
+    _, artist_id = listing
+    assert client.post(f'/artists/{artist_id}/edit', data=artist_form(1)).status_code == 302
+    before = rollups(app)
+
+    response = client.post(f'/artists/{artist_id}/edit', data=artist_form(1, genres=['Punk']))
+    assert response.status_code == 409
+    assert row(app, Artist, artist_id) == ('San Francisco', ['Folk'], 2)
+    assert rollups(app) == before
+
+
+def test_edit_missing_entity_is_not_found(app, client, listing):
+    before = rollups(app)
+    assert client.post('/venues/999/edit', data=venue_form(1)).status_code == 404
+    assert client.post('/artists/999/edit', data=artist_form(1)).status_code == 404
+    assert rollups(app) == before
+
+
+def test_edit_updates_only_changed_columns(app, client, listing):
+    venue_id, _ = listing
+    client.post(f'/venues/{venue_id}/edit', data=venue_form(1))
+    updates = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('UPDATE "Venue"'):
+            updates.append(statement)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        assert client.post(f'/venues/{venue_id}/edit', data=venue_form(2, phone='555-555-5555')).status_code == 302
+        assert client.post(f'/venues/{venue_id}/edit', data=venue_form(3, phone='555-555-5555')).status_code == 302
+    finally:
+        with app.app_context():
+            event.remove(db.engine, 'before_cursor_execute', capture)
+    assert [update.split(' WHERE ')[0].split(' SET ')[1] for update in updates] == \
+        ['phone=?, version=("Venue".version + ?)', 'version=("Venue".version + ?)']
+    assert row(app, Venue, venue_id) == ('Oakland', ['Jazz'], 4)
@@ -1,12 +1,12 @@
 import re
+from datetime import datetime, timedelta
 
 import babel
 import dateutil.parser
-import dateutil.parser
 
 
 def format_datetime(value, format='medium'):
-    date = dateutil.parser.parse(value)
+    date = value if isinstance(value, datetime) else dateutil.parser.parse(value)
     if format == 'full':
         format = "EEEE MMMM, d, y 'at' h:mma"
     elif format == 'medium':
@@ -14,6 +14,18 @@ def format_datetime(value, format='medium'):
     return babel.dates.format_datetime(date, format, locale='en')
 
 
+def parse_range_bound(value, end=False):
+    """ Parse a ``from``/``to`` query argument into a datetime.
+    A bare date used as an ``end`` bound covers that whole day.
+    """
+    if not value:
+        return None
+    date = dateutil.parser.parse(value)
+    if end and len(value.strip()) <= 10:
+        date += timedelta(days=1)
+    return date
+
+
 # Validators.
 def is_valid_phone(number):
     """ Validate phone numbers like:
@@ -0,0 +1,87 @@
+"""Read-only view models for the detail pages.
+
+Built straight from the column rows in ``queries``, so a render holds plain
+values rather than ORM instances, and shared by the HTML templates and the
+JSON endpoints.
+"""
+from datetime import datetime
+
+
+class _ViewModel:
+    __slots__ = ()
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            object.__setattr__(self, name, values.get(name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is read-only')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'{type(self).__name__} is read-only')
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {self.id}>'
+
+    @classmethod
+    def from_row(cls, row, **values):
+        return cls(**{**row._mapping, **values})
+
+    def to_dict(self):
+        data = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            elif isinstance(value, tuple):
+                value = [item.to_dict() if isinstance(item, _ViewModel) else item for item in value]
+            data[name] = value
+        return data
+
+
+class ShowSummary(_ViewModel):
+    """A show as listed on a venue or artist page; the side being viewed is left as None."""
+    __slots__ = ('id', 'start_time', 'venue_id', 'venue_name', 'venue_image_link', 'venue_version',
+                 'artist_id', 'artist_name', 'artist_image_link', 'artist_version')
+
+
+class _Detail(_ViewModel):
+    __slots__ = ()
+
+    @classmethod
+    def from_rows(cls, row, show_rows, now=None):
+        now = now or datetime.now()
+        past_shows = []
+        upcoming_shows = []
+        for show_row in show_rows:
+            show = ShowSummary.from_row(show_row)
+            if show.start_time <= now:
+                past_shows.append(show)
+            else:
+                upcoming_shows.append(show)
+        return cls.from_row(row, genres=tuple(row.genres or ()),
+                            past_shows=tuple(past_shows), upcoming_shows=tuple(upcoming_shows))
+
+    @property
+    def past_shows_count(self):
+        return len(self.past_shows)
+
+    @property
+    def upcoming_shows_count(self):
+        return len(self.upcoming_shows)
+
+    def to_dict(self):
+        data = super().to_dict()
+        data['past_shows_count'] = self.past_shows_count
+        data['upcoming_shows_count'] = self.upcoming_shows_count
+        return data
+
+
+class VenueDetail(_Detail):
+    __slots__ = ('id', 'name', 'genres', 'address', 'city', 'state', 'phone', 'website', 'facebook_link',
+                 'seeking_talent', 'seeking_description', 'image_link', 'version', 'past_shows', 'upcoming_shows')
+
+
+class ArtistDetail(_Detail):
+    __slots__ = ('id', 'name', 'genres', 'city', 'state', 'phone', 'website', 'facebook_link',
+                 'seeking_venue', 'seeking_description', 'image_link', 'version', 'past_shows', 'upcoming_shows')